@@ -1,5 +1,4 @@
 from openai import OpenAI
-import time
 
 # yfinance module is a popular library that provides a convenient way to download historical market data from Yahoo Finance. 
 # It allows you to fetch historical stock prices, financial statements, and other data related to publicly traded companies.
@@ -11,6 +10,9 @@ from dotenv import load_dotenv
 import os
 import json
 
+# tracer records the run as a span, with a child span per poll, argument parsing and tool call, when TRACE_SAMPLE_RATE is above 0.
+from src.tracing import traced_poll, tracer
+
 # load_dotenv(), the code is instructing the dotenv module to read the .env file and set the environment variables defined in it. 
 # Once loaded, these environment variables can be accessed within the Python script using os.environ or other methods.
 load_dotenv()
@@ -80,23 +82,26 @@ class AssistantManager:
         )
 
     # wait_for_completion method is a function that waits for the assistant to complete processing the run.
+    # src.tracing.traced_poll polls the run every 5 seconds inside an "assistant.run" span and passes every status to on_run_status.
     def wait_for_completion(self):
-        while True:
-            time.sleep(5)
-            run_status = self.client.beta.threads.runs.retrieve(
-                thread_id=self.thread.id,
-                run_id=self.run.id
-            )
-            print(run_status.model_dump_json(indent=4))
-
-            if run_status.status == 'completed':
-                self.process_messages()
-                break
-            elif run_status.status == 'requires_action':
-                print("Function Calling ...")
-                self.call_required_functions(run_status.required_action.submit_tool_outputs.model_dump())
-            else:
-                print("Waiting for the Assistant to process...")
+        traced_poll(
+            lambda: self.client.beta.threads.runs.retrieve(thread_id=self.thread.id, run_id=self.run.id),
+            self.on_run_status,
+            self.model,
+            self.run.id,
+        )
+
+    # on_run_status prints the run, shows the messages once it is completed and calls the required functions when it asks for them.
+    def on_run_status(self, run_status):
+        print(run_status.model_dump_json(indent=4))
+
+        if run_status.status == 'completed':
+            self.process_messages()
+        elif run_status.status == 'requires_action':
+            print("Function Calling ...")
+            self.call_required_functions(run_status.required_action.submit_tool_outputs.model_dump())
+        else:
+            print("Waiting for the Assistant to process...")
 
     def process_messages(self):
         messages = self.client.beta.threads.messages.list(thread_id=self.thread.id)
@@ -111,10 +116,12 @@ class AssistantManager:
 
         for action in required_actions["tool_calls"]:
             func_name = action['function']['name']
-            arguments = json.loads(action['function']['arguments'])
+            with tracer.span("parse_arguments"):
+                arguments = json.loads(action['function']['arguments'])
 
             if func_name == "get_stock_price":
-                output = get_stock_price(symbol=arguments['symbol'])
+                with tracer.span(f"execute_tool {func_name}", {"gen_ai.tool.name": func_name, "gen_ai.tool.call.id": action['id']}):
+                    output = get_stock_price(symbol=arguments['symbol'])
                 tool_outputs.append({
                     "tool_call_id": action['id'],
                     "output": output
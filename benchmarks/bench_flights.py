@@ -0,0 +1,74 @@
+"""Benchmark of the flight schedule index at millions of legs.
+
+Builds a synthetic schedule (routes x days x departures per day), then times
+random next-flight lookups and bookings and reports p50/p99 per operation.
+
+Usage:
+    python benchmarks/bench_flights.py --routes 2000 --days 365 --per-day 4
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.flights import FlightSchedule, format_minutes, synthetic_rows, to_minutes  # noqa: E402
+
+AIRPORTS = ["".join(code) for code in itertools.product("ABCDEFGHIJ", repeat=3)]
+
+
+def timed(operation, arguments):
+    latencies = []
+    for args in arguments:
+        start = time.perf_counter()
+        operation(*args)
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    return {"ops": len(latencies), "p50_us": round(float(p50), 1), "p99_us": round(float(p99), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=10000)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per operation")
+    args = parser.parse_args()
+
+    random.seed(0)
+    routes = random.sample([(a, b) for a in AIRPORTS[:100] for b in AIRPORTS[:100] if a != b], args.routes)
+    start_day = "2026-01-01 00:00"
+
+    start = time.perf_counter()
+    schedule = FlightSchedule.from_rows(list(synthetic_rows(routes, start_day, args.days, args.per_day)))
+    print(f"built {len(schedule)} legs in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    first, last = to_minutes(start_day), to_minutes(start_day) + args.days * 1440
+    lookups = [(*random.choice(routes), format_minutes(random.randrange(first, last))) for _ in range(args.ops)]
+    bookings = [
+        (origin, destination, leg["datetime"], leg["airline"])
+        for origin, destination, after in lookups
+        for leg in schedule.next_flights(origin, destination, after)
+    ]
+
+    results = {
+        "next_flight": timed(schedule.next_flights, lookups),
+        "book": timed(schedule.book, bookings),
+    }
+    for name, result in results.items():
+        if args.json:
+            print(json.dumps({"operation": name, "legs": len(schedule), **result}))
+        else:
+            print(f"{name:<12} {result['ops']:>6} ops  p50 {result['p50_us']:>7} us  p99 {result['p99_us']:>7} us")
+
+
+if __name__ == "__main__":
+    main()
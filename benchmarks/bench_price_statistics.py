@@ -0,0 +1,69 @@
+"""Benchmark of the get_price_statistics analytics over multi-year daily prices.
+
+Generates random-walk daily closes on business days for --symbols symbols
+over --years years, then times src.analytics.price_statistics (returns,
+volatility, drawdown, moving averages and the correlation matrix) and
+reports p50/p99 per call.
+
+Usage:
+    python benchmarks/bench_price_statistics.py --symbols 5 --years 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.analytics import price_statistics  # noqa: E402
+
+
+def synthetic_series(symbols, years, seed=0):
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64("2026-10-19") - int(years * 365.25), np.datetime64("2026-10-19"))
+    days = days[np.is_busday(days)]
+    return {
+        f"SYM{i}": (days, 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(days)))))
+        for i in range(symbols)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=5)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON object")
+    args = parser.parse_args()
+
+    series = synthetic_series(args.symbols, args.years)
+    latencies = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        result = price_statistics(series)
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+
+    summary = {
+        "symbols": args.symbols,
+        "trading_days": len(next(iter(series.values()))[0]),
+        "calls": args.calls,
+        "p50_ms": round(float(p50), 2),
+        "p99_ms": round(float(p99), 2),
+        "result_bytes": len(json.dumps(result)),
+    }
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        print(
+            f"{summary['symbols']} symbols x {summary['trading_days']} days  p50 {summary['p50_ms']} ms  "
+            f"p99 {summary['p99_ms']} ms  result {summary['result_bytes']} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark of per-worker memory with the memory-mapped price store.
+
+Writes --symbols synthetic daily OHLCV histories of --years years into a
+temporary price store, then starts --workers processes that each compute
+get_price_statistics over every symbol, either reading the store's memory
+maps ("memmap") or loading private copies of the arrays ("copy", what every
+worker downloading its own histories amounts to). Reports each mode's median
+private (RssAnon) and shared file-backed (RssFile) memory per worker, from
+/proc (Linux only).
+
+Usage:
+    python benchmarks/bench_price_store.py --symbols 500 --years 10 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.analytics import series_statistics  # noqa: E402
+from src.price_store import COLUMNS, PriceStore, PriceStoreUpdater  # noqa: E402
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return {key: int(fields[key].split()[0]) / 1024 for key in ("RssAnon", "RssFile")}
+
+
+def worker(root, mode):
+    store = PriceStore(root)
+    before = rss_mb()
+    start = time.perf_counter()
+    held = []
+    for symbol in store.symbols():
+        columns = store.history(symbol, columns=tuple(COLUMNS))
+        if mode == "copy":
+            columns = tuple(np.array(column) for column in columns)
+        held.append(columns)
+        series_statistics(columns[0], columns[4])
+    elapsed = time.perf_counter() - start
+    after = rss_mb()
+    return {key: after[key] - before[key] for key in after}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per mode")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    days = np.arange(np.datetime64("2026-10-19") - int(args.years * 365.25), np.datetime64("2026-10-19"))
+    days = days[np.is_busday(days)]
+    with tempfile.TemporaryDirectory() as root:
+        with PriceStoreUpdater(root) as updater:
+            for i in range(args.symbols):
+                close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(days))))
+                updater.append(f"SYM{i}", days, open=close, high=close, low=close, close=close, volume=np.ones(len(days)))
+        size_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files) / 2**20
+
+        context = multiprocessing.get_context("spawn")
+        for mode in ("copy", "memmap"):
+            with context.Pool(args.workers) as pool:
+                results = pool.starmap(worker, [(root, mode)] * args.workers)
+            summary = {
+                "mode": mode,
+                "symbols": args.symbols,
+                "store_mb": round(size_mb, 1),
+                "workers": args.workers,
+                "private_mb_per_worker": round(float(np.median([r["RssAnon"] for r, _ in results])), 1),
+                "shared_mb_per_worker": round(float(np.median([r["RssFile"] for r, _ in results])), 1),
+                "statistics_s": round(float(np.median([elapsed for _, elapsed in results])), 2),
+            }
+            if args.json:
+                print(json.dumps(summary))
+            else:
+                print(
+                    f"{mode:<7} {args.workers} workers x {args.symbols} symbols ({summary['store_mb']} MB)  "
+                    f"private {summary['private_mb_per_worker']:>7} MB  shared {summary['shared_mb_per_worker']:>7} MB  "
+                    f"statistics {summary['statistics_s']} s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold-start benchmark of the CLI subcommands.
+
+Runs `python -m src <command> --help` in fresh interpreters and reports the
+best and median wall time per command, plus the slowest imports reported by
+`python -X importtime` for it. Commands whose dependencies are not installed
+are reported as failed.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --top 5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.cli import COMMANDS  # noqa: E402
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def cold_start(command, runs):
+    """Wall times of `command --help` in fresh interpreters, or None if it fails."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-m", "src", command, "--help"], cwd=ROOT, capture_output=True
+        )
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None
+    return times
+
+
+def slowest_imports(command, top):
+    """Top-level imports with the largest cumulative import time, in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src", command, "--help"], cwd=ROOT, capture_output=True, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # Only count the modules imported directly (one level of indentation).
+        if match and len(match.group(3)) == 1:
+            imports.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(imports, key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", nargs="+", choices=sorted(COMMANDS), default=list(COMMANDS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="number of slowest imports to show")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per command")
+    args = parser.parse_args()
+
+    for command in args.commands:
+        times = cold_start(command, args.runs)
+        if times is None:
+            summary = {"command": command, "error": "failed (missing dependency?)"}
+        else:
+            summary = {
+                "command": command,
+                "best_ms": round(min(times) * 1000, 1),
+                "median_ms": round(float(np.median(times)) * 1000, 1),
+                "slowest_imports_ms": dict(slowest_imports(command, args.top)),
+            }
+
+        if args.json:
+            print(json.dumps(summary))
+        elif "error" in summary:
+            print(f"{command:<8} {summary['error']}")
+        else:
+            imports = ", ".join(f"{name} {ms:.0f}" for name, ms in summary["slowest_imports_ms"].items())
+            print(f"{command:<8} best {summary['best_ms']:>7} ms  median {summary['median_ms']:>7} ms  [{imports}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""End-to-end benchmark of the tool loops against the local mock server.
+
+Drives the stock-analyst loop of function_calling_stocks.py, the handlers of
+the chainlit weather app in function_call_get_weather.py (with chainlit stubbed
+out) and src.sql_agent.ask over data/Chinook.db, all against
+benchmarks/mock_server.py, and reports turns/sec and p50/p95/p99 turn latency
+per flow.
+
+Usage:
+    python benchmarks/bench_tool_loops.py --turns 200 --concurrency 8 --latency-ms 150
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_server import MockCompletionServer, load_recordings  # noqa: E402
+
+STOCK_QUESTION = "What was the value of 10 AAPL shares at the close on 2023-11-01?"
+WEATHER_QUESTION = "What's the weather like in Glasgow today?"
+SQL_QUESTION = "Hi, who are the top 5 artists by number of tracks?"
+
+
+def point_clients_at(base_url):
+    """Point every client used by the scripts at the mock server. Must run before they are imported."""
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ["WEATHER_API_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+    os.environ.setdefault("OPENWEATHER_API_KEY", "mock")
+    # The weather app stores every message; the benchmark's go to a throwaway database.
+    os.environ["CONVERSATION_DB"] = os.path.join(tempfile.mkdtemp(), "conversations.db")
+
+
+def stocks_flow(base_url):
+    import function_calling_stocks as stocks
+
+    def replay_price(symbol, date):
+        response = requests.get(f"{base_url}/prices", params={"symbol": symbol, "date": date})
+        response.raise_for_status()
+        return response.json()["close"]
+
+    stocks.get_price = replay_price
+
+    def turn():
+        stocks.run_conversation(STOCK_QUESTION)
+
+    return turn
+
+
+class _UserSession:
+    """chainlit.user_session: a dict per chat session, here one per benchmark turn."""
+
+    def __init__(self):
+        self.current = contextvars.ContextVar("user_session")
+
+    def get(self, key, default=None):
+        return self.current.get().get(key, default)
+
+    def set(self, key, value):
+        self.current.get()[key] = value
+
+
+class _Message:
+    def __init__(self, content=""):
+        self.content = content
+
+    async def send(self):
+        return self
+
+    async def update(self):
+        return self
+
+    async def stream_token(self, token):
+        self.content += token
+
+
+def stub_chainlit():
+    """Install a minimal chainlit module, so the chainlit app can be imported and its handlers called directly."""
+    cl = types.ModuleType("chainlit")
+    cl.on_chat_start = cl.on_message = lambda fn: fn
+    cl.user_session = _UserSession()
+    cl.make_async = lambda fn: lambda *args, **kwargs: asyncio.to_thread(fn, *args, **kwargs)
+    cl.Message = _Message
+    sys.modules["chainlit"] = cl
+    return cl
+
+
+def weather_flow(base_url):
+    # The handlers of the chainlit app, run on one event loop like chainlit's, with the shared async client.
+    cl = stub_chainlit()
+    import function_call_get_weather as app
+
+    # The app prints every step; that would bury the results.
+    app.print = lambda *args, **kwargs: None
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="chainlit", daemon=True).start()
+
+    async def chat():
+        cl.user_session.current.set({"id": uuid.uuid4().hex})
+        await app.start()
+        await app.main(WEATHER_QUESTION)
+
+    def turn():
+        asyncio.run_coroutine_threadsafe(chat(), loop).result()
+
+    return turn
+
+
+def sql_flow(base_url):
+    from src.sql_agent import ask
+
+    database = os.path.join(ROOT, "data", "Chinook.db")
+
+    def turn():
+        ask(SQL_QUESTION, db_path=database)
+
+    return turn
+
+
+FLOWS = {"stocks": stocks_flow, "weather": weather_flow, "sql": sql_flow}
+
+
+def run_flow(turn, turns, concurrency):
+    """Run `turns` turns with `concurrency` workers and return (latencies, errors, elapsed)."""
+    def timed():
+        start = time.perf_counter()
+        try:
+            turn()
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: timed(), range(turns)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([r for r in results if r is not None])
+    return latencies, results.count(None), elapsed
+
+
+def summarize(name, latencies, errors, elapsed):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else (float("nan"),) * 3
+    return {
+        "flow": name,
+        "turns": int(len(latencies)),
+        "errors": errors,
+        "turns_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flows", nargs="+", choices=sorted(FLOWS), default=sorted(FLOWS))
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per flow")
+    args = parser.parse_args()
+
+    server = MockCompletionServer(
+        ("127.0.0.1", 0),
+        load_recordings(),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+    ).start()
+    point_clients_at(server.base_url)
+
+    for name in args.flows:
+        turn = FLOWS[name](server.base_url)
+        summary = summarize(name, *run_flow(turn, args.turns, args.concurrency))
+        if args.json:
+            print(json.dumps(summary))
+        else:
+            print(
+                f"{summary['flow']:<8} {summary['turns']:>5} turns  {summary['errors']:>3} errors  "
+                f"{summary['turns_per_sec']:>8} turns/s  p50 {summary['p50_ms']:>7} ms  "
+                f"p95 {summary['p95_ms']:>7} ms  p99 {summary['p99_ms']:>7} ms"
+            )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark of the tool execution classes on a CPU-heavy tool.
+
+Runs the same CPU-bound tool (pure-Python work plus a NumPy pass over a large
+price array, which goes to process tools through shared memory) registered
+as inline, thread and process, with --calls concurrent calls awaited from an
+event loop. Reports the wall time per class and the worst event loop lag
+observed meanwhile, i.e. how long a chat session would have been stalled.
+
+Usage:
+    python benchmarks/bench_tools.py --calls 8 --size 2000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.tools import INLINE, PROCESS, THREAD, ToolRegistry  # noqa: E402
+
+
+def price_statistics(prices, window=20):
+    """Rolling mean volatility of a price series, plus a pure-Python pass holding the GIL."""
+    returns = np.diff(np.log(prices))
+    cumulative = np.cumsum(np.insert(returns ** 2, 0, 0.0))
+    volatility = np.sqrt((cumulative[window:] - cumulative[:-window]) / window)
+    drawdown = 0.0
+    peak = float(prices[0])
+    for price in prices[:: max(len(prices) // 200000, 1)].tolist():
+        peak = max(peak, price)
+        drawdown = min(drawdown, price / peak - 1)
+    return {"volatility": float(volatility.mean()), "max_drawdown": drawdown}
+
+
+async def watch_loop(stop, interval=0.005):
+    """Worst delay of a periodic wake-up while the tools run."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(registry, name, calls, prices):
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(registry.acall(name, prices=prices) for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await watcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--size", type=int, default=2000000, help="prices per call")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per execution class")
+    args = parser.parse_args()
+
+    prices = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, args.size)))
+    registry = ToolRegistry()
+    for execution in (INLINE, THREAD, PROCESS):
+        registry.register(price_statistics, name=execution, execution=execution)
+    # Wait for the warm-up of the process pool, which a long-running app pays once at startup.
+    registry.start()
+    registry.call(PROCESS, prices=prices[:100])
+
+    for execution in (INLINE, THREAD, PROCESS):
+        elapsed, lag = asyncio.run(run(registry, execution, args.calls, prices))
+        result = {
+            "execution": execution,
+            "calls": args.calls,
+            "wall_ms": round(elapsed * 1000, 1),
+            "max_loop_lag_ms": round(lag * 1000, 1),
+        }
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{execution:<8} {args.calls} calls  wall {result['wall_ms']:>8} ms  max loop lag {result['max_loop_lag_ms']:>8} ms")
+    registry.shutdown()
+
+
+if __name__ == "__main__":
+    main()
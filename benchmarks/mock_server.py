@@ -0,0 +1,309 @@
+"""Local stand-in for the OpenAI, weatherapi and price endpoints used by the scripts.
+
+The server replays recorded responses so the tool loops can be driven and
+benchmarked offline. It speaks the shapes the scripts use:
+
+    POST /v1/chat/completions
+    POST /v1/assistants, /v1/threads, /v1/threads/{id}/messages, /v1/threads/{id}/runs
+    GET  /v1/threads/{id}/runs/{run_id}, /v1/threads/{id}/messages
+    POST /v1/threads/{id}/runs/{run_id}/submit_tool_outputs
+    GET  /v1/current.json?q=<location>
+    GET  /v1/prices?symbol=<symbol>&date=<date>
+
+Chat completions are matched against the "chat" recordings in order: the first
+recording whose "match" fits the last non-system message of the request wins.
+A match can check that message's "role", its function/tool "name", and a substring it
+"contains". With --record the server forwards unmatched chat completions to an
+upstream API and appends the real response to the recordings file.
+
+Usage:
+    python benchmarks/mock_server.py --port 8765 --latency-ms 300 --error-rate 0.02
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+RECORDINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings.json")
+
+
+def load_recordings(path=RECORDINGS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _last_message_matches(match, message):
+    if "role" in match and message.get("role") != match["role"]:
+        return False
+    if "name" in match and message.get("name") != match["name"]:
+        return False
+    if "contains" in match and match["contains"].lower() not in str(message.get("content") or "").lower():
+        return False
+    return True
+
+
+class MockCompletionServer(ThreadingHTTPServer):
+    """Threaded HTTP server that replays recordings with injected latency and errors."""
+
+    daemon_threads = True
+
+    def __init__(self, address, recordings, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 error_status=500, upstream=None, recordings_path=RECORDINGS_PATH):
+        super().__init__(address, MockRequestHandler)
+        self.recordings = recordings
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.upstream = upstream
+        self.recordings_path = recordings_path
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.runs = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve on a daemon thread and return self, for use from benchmarks."""
+        threading.Thread(target=self.serve_forever, name="mock-server", daemon=True).start()
+        return self
+
+    def inject_latency(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def next_id(self, prefix):
+        return f"{prefix}_{next(self.ids)}"
+
+    def chat_completion(self, body):
+        # The stock loop appends its system prompt after the user message, so match on
+        # the last message that is not a system prompt.
+        message = next((m for m in reversed(body.get("messages", [])) if m.get("role") != "system"), {})
+        for recording in self.recordings.get("chat", []):
+            if _last_message_matches(recording.get("match", {}), message):
+                return self._completion_envelope(body, recording["message"], recording.get("usage"))
+        if self.upstream:
+            return self._record(body, message)
+        return None
+
+    def _completion_envelope(self, body, message, usage=None):
+        finish_reason = "stop"
+        if message.get("function_call"):
+            finish_reason = "function_call"
+        elif message.get("tool_calls"):
+            finish_reason = "tool_calls"
+        return {
+            "id": self.next_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _record(self, body, message):
+        response = requests.post(
+            f"{self.upstream}/chat/completions",
+            headers={"Authorization": "Bearer " + os.getenv("OPENAI_API_KEY", "")},
+            json=body,
+            timeout=120,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        match = {"role": message.get("role")}
+        if message.get("name"):
+            match["name"] = message["name"]
+        elif message.get("content"):
+            match["contains"] = str(message["content"])[:80]
+        with self.lock:
+            self.recordings.setdefault("chat", []).append({
+                "match": match,
+                "message": payload["choices"][0]["message"],
+                "usage": payload.get("usage"),
+            })
+            with open(self.recordings_path, "w") as f:
+                json.dump(self.recordings, f, indent=2)
+        return payload
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Clients that write the request headers and body separately (httpx) would otherwise wait
+    # for a delayed ACK on every keep-alive request, adding ~40 ms that no real API adds.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        body = self._read_body() if method == "POST" else {}
+        server = self.server
+
+        server.inject_latency()
+        if server.should_fail():
+            headers = {"Retry-After": "1"} if server.error_status == 429 else None
+            self._send_json(server.error_status, {"error": {"message": "injected failure", "type": "mock_error"}}, headers)
+            return
+
+        route = (method, tuple(p if i % 2 == 0 else "*" for i, p in enumerate(parts[1:])))
+        handler = ROUTES.get(route)
+        if parts[:1] != ["v1"] or handler is None:
+            self._send_json(404, {"error": {"message": f"no route for {method} {url.path}"}})
+            return
+        status, payload = handler(server, parts[1:], parse_qs(url.query), body)
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+def _chat_completions(server, parts, query, body):
+    payload = server.chat_completion(body)
+    if payload is None:
+        return 404, {"error": {"message": "no recording matches the last message"}}
+    return 200, payload
+
+
+def _current_weather(server, parts, query, body):
+    location = query.get("q", [""])[0]
+    weather = server.recordings.get("weather", {})
+    current = weather.get(location.lower(), weather.get("default"))
+    if current is None:
+        return 400, {"error": {"code": 1006, "message": "No matching location found."}}
+    return 200, {"location": {"name": location}, "current": current}
+
+
+def _prices(server, parts, query, body):
+    symbol = query.get("symbol", [""])[0].upper()
+    prices = server.recordings.get("prices", {})
+    if symbol not in prices:
+        return 404, {"error": {"message": f"no recorded price for {symbol}"}}
+    return 200, {"symbol": symbol, "date": query.get("date", [""])[0], "close": prices[symbol]}
+
+
+def _create(prefix, obj):
+    def handler(server, parts, query, body):
+        return 200, {"id": server.next_id(prefix), "object": obj, "created_at": int(time.time()), **body}
+    return handler
+
+
+def _create_run(server, parts, query, body):
+    run_id = server.next_id("run")
+    with server.lock:
+        server.runs[run_id] = {"thread_id": parts[1], "polls": 0, "submitted": False}
+    return 200, {"id": run_id, "object": "thread.run", "thread_id": parts[1], "status": "queued"}
+
+
+def _retrieve_run(server, parts, query, body):
+    run_id = parts[3]
+    with server.lock:
+        run = server.runs.setdefault(run_id, {"thread_id": parts[1], "polls": 0, "submitted": False})
+        run["polls"] += 1
+    assistant = server.recordings.get("assistant", {})
+    payload = {"id": run_id, "object": "thread.run", "thread_id": parts[1], "status": "in_progress",
+               "required_action": None}
+    if run["submitted"] or not assistant.get("tool_calls"):
+        payload["status"] = "completed"
+    elif run["polls"] > 1:
+        payload["status"] = "requires_action"
+        payload["required_action"] = {
+            "type": "submit_tool_outputs",
+            "submit_tool_outputs": {"tool_calls": assistant["tool_calls"]},
+        }
+    return 200, payload
+
+
+def _submit_tool_outputs(server, parts, query, body):
+    run_id = parts[3]
+    with server.lock:
+        server.runs.setdefault(run_id, {"thread_id": parts[1], "polls": 0})["submitted"] = True
+    return 200, {"id": run_id, "object": "thread.run", "thread_id": parts[1], "status": "queued"}
+
+
+def _list_messages(server, parts, query, body):
+    reply = server.recordings.get("assistant", {}).get("reply", "")
+    message = {
+        "id": server.next_id("msg"),
+        "object": "thread.message",
+        "thread_id": parts[1],
+        "role": "assistant",
+        "content": [{"type": "text", "text": {"value": reply, "annotations": []}}],
+    }
+    return 200, {"object": "list", "data": [message], "has_more": False}
+
+
+ROUTES = {
+    ("POST", ("chat", "*")): _chat_completions,
+    ("GET", ("current.json",)): _current_weather,
+    ("GET", ("prices",)): _prices,
+    ("POST", ("assistants",)): _create("asst", "assistant"),
+    ("POST", ("threads",)): _create("thread", "thread"),
+    ("POST", ("threads", "*", "messages")): _create("msg", "thread.message"),
+    ("GET", ("threads", "*", "messages")): _list_messages,
+    ("POST", ("threads", "*", "runs")): _create_run,
+    ("GET", ("threads", "*", "runs", "*")): _retrieve_run,
+    ("POST", ("threads", "*", "runs", "*", "submit_tool_outputs")): _submit_tool_outputs,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", default=RECORDINGS_PATH)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--record", metavar="UPSTREAM", help="forward unmatched chat completions to UPSTREAM and record them")
+    args = parser.parse_args()
+
+    server = MockCompletionServer(
+        (args.host, args.port),
+        load_recordings(args.recordings),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        upstream=args.record,
+        recordings_path=args.recordings,
+    )
+    print(f"Mock server listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
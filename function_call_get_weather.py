@@ -1,8 +1,13 @@
 import openai
 from dotenv import load_dotenv
 import chainlit as cl
-from src.llm import chat_completion_request, messages, functions
-from src.sys_config import conv_prompt
+from src.llm import achat_completion_request, astream_chat_completion, messages, functions
+from src.sys_config import conv_prompt, weather_template
+from src.conversation_store import ConversationStore
+from src.prefetch import Prefetcher, extract_locations
+from src.semantic_cache import CACHE_DIR, SemanticCache
+from src.tools import THREAD, ToolRegistry
+from src.tracing import current_span, tracer
 from src.utils import get_current_weather
 import json
 import os
@@ -11,48 +16,178 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-def execute_function_call(assistant_message):
-    if assistant_message.get("function_call").get("name") == "get_current_weather":
-        location = json.loads(assistant_message.get("function_call").get("arguments") )["location"]
-        results = get_current_weather(location)
+# Answer well-structured weather results from a local template instead of a second
+# model round trip. Optionally stream a model rephrasing over the templated answer.
+USE_RESPONSE_TEMPLATES = os.getenv("WEATHER_RESPONSE_TEMPLATES", "1") == "1"
+REFINE_TEMPLATED_RESPONSES = os.getenv("WEATHER_REFINE_RESPONSES", "0") == "1"
+
+# Warm the weather cache with locations named in the message while the first
+# completion is in flight. Hits and wasted fetches are kept in its metrics.
+USE_PREFETCH = os.getenv("WEATHER_PREFETCH", "0") == "1"
+weather_prefetcher = Prefetcher(
+    get_current_weather, extract_locations, key=lambda location: (location.strip().lower(),)
+)
+
+# Answer paraphrases of a recent weather question ("weather in Glasgow today",
+# "what's it like in Glasgow right now") from a local semantic cache, skipping
+# both the completion and the weather lookup. Only questions naming the same
+# locations can share an answer, and answers expire with the weather cache.
+USE_SEMANTIC_CACHE = os.getenv("WEATHER_SEMANTIC_CACHE", "0") == "1"
+semantic_cache = SemanticCache(
+    thresholds={"get_current_weather": 0.6},
+    ttls={"get_current_weather": 600},
+    path=os.path.join(CACHE_DIR, "weather.npz"),
+) if USE_SEMANTIC_CACHE else None
+
+# Every message is appended to a persistent store, so a returning user resumes
+# from the recent window (and summary) without the full history in memory.
+store = ConversationStore()
+
+# The weather lookup is a blocking HTTP call, so it runs on the registry's
+# thread pool and the event loop keeps serving other sessions meanwhile.
+tools = ToolRegistry()
+tools.register(get_current_weather, execution=THREAD)
+
+# Upper bound on the messages kept per session (system prompt excluded),
+# so long-running sessions keep a bounded amount of memory.
+MAX_HISTORY_MESSAGES = 20
+
+
+def trim_history(history):
+    """Keep the system messages plus the most recent MAX_HISTORY_MESSAGES turns."""
+    system = [m for m in history if m["role"] == "system"]
+    rest = [m for m in history if m["role"] != "system"]
+    history[:] = system + rest[-MAX_HISTORY_MESSAGES:]
+
+
+async def execute_function_call(chat_response, speculation=None):
+    name = chat_response.function_call["name"]
+    if name in tools:
+        location = chat_response.arguments["location"]
+        if speculation is not None:
+            speculation.mark_used(location)
+        results = await tools.acall(name, location=location)
     else:
-        results = f"Error: function {assistant_message['function_call']['name']} does not exist"
+        results = f"Error: function {name} does not exist"
 
     return results
 
 
-def get_natural_response(content, message):
+def render_template(results):
+    """Render a weather result with the local template, or return None if it cannot be templated."""
+    if not isinstance(results, dict):
+        return None
+    if any(results.get(key) in (None, "") for key in ("location", "temperature", "description", "humidity")):
+        return None
+    return weather_template.format(description_lower=str(results["description"]).lower(), **results)
+
+
+async def refine_response(reply, content, message, history):
+    """Stream a model rephrasing of the tool result over an already sent message."""
     convert_prompt = conv_prompt.replace("<query>", message).replace("<api_result>", content)
-    messages.append({"role": "user", "content": convert_prompt})
-    convert_prompt_response = chat_completion_request(messages=messages)
+    reply.content = ""
+    async for token in astream_chat_completion(messages=history[:-1] + [{"role": "user", "content": convert_prompt}]):
+        await reply.stream_token(token)
+    await reply.update()
+    history[-1] = {"role": "assistant", "content": reply.content}
+
+
+async def get_natural_response(content, message, history):
+    convert_prompt = conv_prompt.replace("<query>", message).replace("<api_result>", content)
+    history.append({"role": "user", "content": convert_prompt})
+    convert_prompt_response = await achat_completion_request(messages=history, caller=cl.user_session.get("session_key"))
+    convert_prompt_response.raise_for_status()
     print(f"\n>>>> recieved message: {convert_prompt_response.json()}")
-    new_assistant_message = convert_prompt_response.json()["choices"][0]["message"]
-    messages.append(new_assistant_message)
+    new_assistant_message = convert_prompt_response.message
+    history.append(new_assistant_message)
     updated_content = new_assistant_message["content"]
     print(f"\n>>>> natural response: \n{updated_content}")
     return updated_content
 
+
+def session_key():
+    """Authenticated users resume their own history; anonymous sessions get a fresh one."""
+    user = cl.user_session.get("user")
+    return getattr(user, "identifier", None) or cl.user_session.get("id")
+
+
+@cl.on_chat_start
+async def start():
+    # Every chainlit session gets its own copy of the seed conversation,
+    # followed by the latest summary and the recent window of its stored history.
+    key = session_key()
+    summary, recent = await cl.make_async(store.load_recent)(key, MAX_HISTORY_MESSAGES)
+    history = list(messages)
+    if summary:
+        history.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+    history.extend(recent)
+    cl.user_session.set("session_key", key)
+    cl.user_session.set("messages", history)
+
+
 @cl.on_message
+@tracer.traced("weather.turn")
 async def main(message: str):
-    messages.append({"role": "user", "content": message})
-    chat_response = chat_completion_request(messages=messages, functions=functions)
+    history = cl.user_session.get("messages")
+    turn_start = len(history)
+    history.append({"role": "user", "content": message})
+    locations = [location for (location,) in extract_locations(message)]
+    cached = semantic_cache.lookup(message, key=locations) if semantic_cache and locations else None
+    current_span().set_attribute("cache.hit", cached is not None)
+    if cached is not None:
+        print(f"\n>>>> semantic cache hit: {semantic_cache.snapshot()}\n")
+        history.append({"role": "assistant", "content": cached})
+        await cl.Message(content=cached).send()
+    else:
+        speculation = weather_prefetcher.start(message) if USE_PREFETCH else None
+        try:
+            tool = await respond(message, history, speculation)
+        finally:
+            if speculation is not None:
+                speculation.close()
+                print(f"\n>>>> prefetch metrics: {weather_prefetcher.snapshot()}\n")
+        if semantic_cache and locations and tool == "get_current_weather":
+            semantic_cache.store(message, history[-1]["content"], tool, key=locations)
+
+    key = cl.user_session.get("session_key")
+    for new_message in history[turn_start:]:
+        await cl.make_async(store.append)(key, new_message)
+    trim_history(history)
+
+
+async def respond(message, history, speculation):
+    """Answer one message and return the name of the function it called, if any."""
+    chat_response = await achat_completion_request(
+        messages=history, functions=functions, caller=cl.user_session.get("session_key")
+    )
+    chat_response.raise_for_status()
     print(f"\n>>>> complete_chat_response: \n{chat_response.json()}\n")
-    
-    assistant_message = chat_response.json()["choices"][0]["message"]
+
+    assistant_message = chat_response.message
     print(f"\n>>>> assistant message: \n{assistant_message}\n")
 
     if assistant_message.get("function_call"):
-        results = execute_function_call(assistant_message)
+        results = await execute_function_call(chat_response, speculation)
         print(f"\n>>>> results obtained from executing function call: \n{results}\n")
         content = json.dumps(results)
-        content = get_natural_response(content, message)
+        templated = render_template(results) if USE_RESPONSE_TEMPLATES else None
+        if templated is not None:
+            print(f"\n>>>> templated response: \n{templated}\n")
+            history.append({"role": "assistant", "content": templated})
+            reply = cl.Message(content=templated)
+            await reply.send()
+            if REFINE_TEMPLATED_RESPONSES:
+                await refine_response(reply, content, message, history)
+            return assistant_message["function_call"]["name"]
+        content = await get_natural_response(content, message, history)
     else:
-        messages.append(assistant_message)
+        history.append(assistant_message)
         content = assistant_message["content"]
         print(f"\n>>>> results obtained: \n{content}\n")
-    
+
     print(f"\n>>>> Chat response: {content}\n")
 
     await cl.Message(
         content=content
-    ).send()
\ No newline at end of file
+    ).send()
+    return (assistant_message.get("function_call") or {}).get("name")
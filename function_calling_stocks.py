@@ -5,24 +5,57 @@ import json
 # It allows you to record events and error messages at different levels of severity, such as DEBUG, INFO, WARNING, ERROR, and CRITICAL. 
 import logging
 
-# By importing the operator module, you can use its functions to perform operations such as arithmetic, item access, comparison, logical operations, and more. It provides a convenient way to work with operators as functions in Python.
-import operator
+# The argparse module parses command-line arguments; it is used for the single-question and batch entry points.
+import argparse
+
+# The threading module provides the lock that protects the shared price cache when questions are answered concurrently.
+import threading
+
+# The time module is used to measure the latency of every answered question.
+import time
+
+# The os module reads the STOCKS_PREFETCH and STOCKS_SEMANTIC_CACHE environment variables that switch on speculative price prefetching and the answer cache.
+import os
+
+# ThreadPoolExecutor runs the tool loops of many questions concurrently with a configurable number of workers.
+# Future objects let concurrent workers asking for the same price wait on a single download.
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # By importing the sys module, you can use its functions and variables to perform tasks such as accessing command-line arguments, interacting with the standard input/output/error streams, and getting information about the Python interpreter.
 import sys
 
+# The ast module parses arithmetic expressions for the calculate function without evaluating arbitrary Python code.
+import ast
+
 # By importing the datetime module, you can use its classes and functions to perform operations such as creating date and time objects, extracting specific components from dates and times, performing arithmetic operations on dates and times, and formatting dates and times into strings.
 import datetime
 
-# By importing the openai module, you can use its functions and classes to make requests to the OpenAI API, such as generating text, completing prompts, and performing other natural language processing tasks using the power of the GPT-3 and GPT4 models.
-import openai
+# NumPy evaluates the calculate function's arithmetic, element-wise on arrays and as reductions.
+import numpy as np
 
-# The yfinance module is a popular Python library that provides a simple and convenient way to download historical market data from Yahoo Finance. 
-# It allows you to fetch historical stock prices, dividend data, and other financial information for analysis and research purposes.
-import yfinance as yf
+# The Prefetcher guesses likely tickers and dates from the question and downloads their prices while the model is still deciding to call get_price.
+from src.prefetch import Prefetcher, extract_price_keys, extract_tickers
+
+# The SemanticCache answers paraphrases of earlier questions without calling the model or any tool.
+from src.semantic_cache import CACHE_DIR, SemanticCache, numbers
+
+# execute_plan runs a small DAG of get_price and calculate calls submitted by the model in a single function call.
+from src.plan import execute_plan, plan_metadata
 
-# Assigning the current date to the variable TODAY in the format "YYYY/MM/DD".
-TODAY = datetime.date.today().strftime("%Y/%m/%d")
+# PriceStore reads the daily prices kept up to date by a single updater process ("python -m src prices update ...") from memory-mapped .npy columns.
+from src.price_store import PriceStore
+
+# price_statistics computes the returns, volatility, drawdowns, moving averages and correlations of get_price_statistics over whole price arrays with NumPy.
+from src.analytics import price_statistics
+
+# ToolRegistry runs every tool according to its execution class: inline, on a thread pool or on a warm process pool.
+from src.tools import INLINE, PROCESS, THREAD, ToolRegistry
+
+# tracer records nested spans of a turn (completions, argument parsing, tool calls) when TRACE_SAMPLE_RATE is above 0.
+from src.tracing import current_span, tracer
+
+# Assigning the current date to the variable TODAY in the format "YYYY-MM-DD", the date format of the tool schemas and of the price store.
+TODAY = datetime.date.today().isoformat()
 
 # Configutation of the logging function. 
 # The logging module provides a flexible framework for emitting log messages from Python programs.
@@ -45,7 +78,12 @@ logger.setLevel(logging.INFO)
 # Returning the closing price to the "Close" column of history DataFrame; retrieving the value at the first row using iloc[0]. 
 # # The item() method is used to convert the value to a float.
 
-def get_price(symbol: str, date: str) -> float:
+# The yfinance module is a popular Python library that provides a simple and convenient way to download historical market data from Yahoo Finance. 
+# It is imported on the first download rather than at the top of the file: importing it (and pandas) takes most of a second, which --help and cached answers should not pay.
+
+def download_price(symbol: str, date: str) -> float:
+    import yfinance as yf
+
     logger.info(f"Calling get_price with {symbol=} and {date=}")
 
     history = yf.download(
@@ -54,16 +92,269 @@ def get_price(symbol: str, date: str) -> float:
 
     return history["Close"].iloc[0].item()
 
-# calculate function takes three parameters: a and b of type float, and op of type str. It returns a float value.
-# logging an informational message, indicating that the calculate function is being called; displaying the values of a, b, and op.
-# It uses the getattr() function to dynamically retrieve the appropriate operator function from the operator module based on the value of op. 
-# The getattr() function takes the operator module as the first argument and the value of op as the second argument.
-# It calls the retrieved operator function with the arguments a and b and returns the result.
+# price_cache is shared by every conversation in the process and maps (symbol, date) to a Future holding the closing price.
+# The first caller for a key downloads the price; concurrent callers for the same key wait on the same Future instead of downloading it again.
+# Failed downloads are removed from the cache so they can be retried by a later question.
+
+price_cache = {}
+price_cache_lock = threading.Lock()
+
+# iso_date returns a date given as YYYY-MM-DD, YYYY/MM/DD or YYYY.MM.DD in the format YYYY-MM-DD, and raises a ValueError for anything else.
+# Dates are normalized before they reach the caches, the price store or NumPy, which only parse the YYYY-MM-DD format.
+
+def iso_date(date: str) -> str:
+    return datetime.date.fromisoformat(date.strip().replace("/", "-").replace(".", "-")).isoformat()
+
+
+def get_price(symbol: str, date: str) -> float:
+    date = iso_date(date)
+    # Prices in the price store are read from its memory-mapped columns, without downloading or caching anything.
+    if price_store.covers(symbol, date, date):
+        (closes,) = price_store.history(symbol, date, columns=("close",))
+        if len(closes):
+            return closes[0].item()
+
+    key = (symbol.upper(), date)
+    with price_cache_lock:
+        future = price_cache.get(key)
+        owner = future is None
+        if owner:
+            future = price_cache[key] = Future()
+
+    if owner:
+        try:
+            future.set_result(download_price(symbol, date))
+        except Exception as e:
+            with price_cache_lock:
+                del price_cache[key]
+            future.set_exception(e)
+
+    return future.result()
+
+# download_history downloads the daily closes of a symbol from start to end (both included) in a single request.
+# yf.download treats end as exclusive, so one day is added to it; the dates come back as a datetime64[D] array and the closes as a float array, without missing values.
+
+def download_history(symbol: str, start: str, end: str):
+    import yfinance as yf
+
+    logger.info(f"Downloading daily closes of {symbol} from {start} to {end}")
+
+    history = yf.download(
+        symbol, start=start, end=str(np.datetime64(end) + 1), interval="1d", progress=False
+    )
+    closes = history["Close"].to_numpy(dtype=float).reshape(-1)
+    dates = history.index.values.astype("datetime64[D]")
+    valid = ~np.isnan(closes)
+    return dates[valid], closes[valid]
+
+# price_store is the on-disk columnar price store at PRICE_STORE_DIR (data/prices by default).
+# Every worker process maps the same files, so price histories are shared through the page cache instead of being downloaded and held by each process.
+# Symbols that are not in the store, dates before their first stored day and dates after its last update fall back to downloading.
+
+price_store = PriceStore()
+
+# history_cache maps a symbol to the range of dates downloaded for it and its (dates, closes) arrays, so analytics over overlapping ranges download each symbol once.
+# A request outside the cached range downloads the union of both ranges and replaces the entry; a lock per symbol keeps concurrent requests from downloading the same symbol twice.
+
+history_cache = {}
+history_locks = {}
+
+
+def get_history(symbol: str, start: str, end: str = None):
+    symbol = symbol.upper()
+    start, end = iso_date(start), iso_date(end) if end else TODAY
+    # The store answers the ranges within its stored days; a range ending after its last update is downloaded instead.
+    if price_store.covers(symbol, start, end):
+        return price_store.history(symbol, start, end)
+
+    with price_cache_lock:
+        lock = history_locks.setdefault(symbol, threading.Lock())
+
+    with lock:
+        cached = history_cache.get(symbol)
+        if cached is None or start < cached[0] or end > cached[1]:
+            first, last = (start, end) if cached is None else (min(start, cached[0]), max(end, cached[1]))
+            cached = history_cache[symbol] = (first, last, *download_history(symbol, first, last))
+
+    _, _, dates, closes = cached
+    # Slicing the cached arrays by date with a binary search; the slices are views, nothing is copied.
+    lo = np.searchsorted(dates, np.datetime64(start), side="left")
+    hi = np.searchsorted(dates, np.datetime64(end), side="right")
+    return dates[lo:hi], closes[lo:hi]
+
+# analytics runs src.analytics.price_statistics on a warm process pool when a request covers at least PROCESS_STATISTICS_ROWS closes (e.g. 20 symbols over 10 years).
+# Such a request computes for tens to hundreds of milliseconds; in a worker process it does not hold the GIL the other questions' threads need meanwhile.
+# Smaller requests are computed in the calling thread, where they take a few milliseconds, less than the round trip to a worker.
+# It is a registry of its own, so price_statistics is not offered to the model as a plan step; its pool starts on the first large request, or in main().
+
+analytics = ToolRegistry()
+analytics.register(price_statistics, execution=PROCESS)
+PROCESS_STATISTICS_ROWS = 50000
+# At most this many histories are downloaded at once, however many symbols the model asks for.
+STATISTICS_FETCH_WORKERS = 8
+
+# get_price_statistics answers a whole analytics question in one tool call: per symbol the return, annualized return and volatility, maximum drawdown, moving averages and best/worst days over the range,
+# and the correlations of the daily returns across symbols. The histories of all symbols are fetched in parallel, then src.analytics computes everything with vectorized NumPy in milliseconds, even over many years.
+
+# Invalid arguments are answered with {"error": message}, and a symbol whose history cannot be fetched or is too short gets its own {"error": message},
+# so the model learns what to correct and still gets the statistics of the other symbols.
+
+def get_price_statistics(symbols: list, start: str, end: str = None, moving_average_windows: list = None) -> dict:
+    logger.info(f"Calling get_price_statistics with {symbols=}, {start=}, {end=} and {moving_average_windows=}")
+
+    if symbols is not None and not (isinstance(symbols, list) and all(isinstance(symbol, str) for symbol in symbols)):
+        return {"error": f"symbols must be a list of ticker symbols, got {symbols!r}"}
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols or () if symbol.strip()))
+    if not symbols:
+        return {"error": "symbols must name at least one ticker symbol"}
+    try:
+        start, end = iso_date(start), iso_date(end) if end else TODAY
+    except ValueError:
+        return {"error": f"Invalid date in {start=} or {end=}, expected YYYY-MM-DD"}
+    if start >= end:
+        return {"error": f"start ({start}) must be before end ({end})"}
+    windows = tuple(moving_average_windows or (20, 50, 200))
+    if not all(isinstance(window, int) and window > 0 for window in windows):
+        return {"error": "moving_average_windows must be positive integers"}
+
+    series, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=min(len(symbols), STATISTICS_FETCH_WORKERS)) as executor:
+        futures = {symbol: executor.submit(get_history, symbol, start, end) for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                series[symbol] = future.result()
+            except Exception as e:
+                errors[symbol] = {"error": f"Could not fetch the history: {type(e).__name__}: {e}"}
+
+    if sum(len(closes) for _, closes in series.values()) >= PROCESS_STATISTICS_ROWS:
+        result = analytics.call("price_statistics", series=series, windows=windows)
+    else:
+        result = price_statistics(series, windows)
+    result["symbols"].update(errors)
+    return result
+
+# price_prefetcher warms price_cache with the (symbol, date) pairs found in a question, at the same time as the first completion request.
+# It is only used when the STOCKS_PREFETCH environment variable is "1" or --prefetch is passed; its metrics count hits, misses and wasted fetches.
+
+price_prefetcher = Prefetcher(
+    lambda symbol, date: get_price(symbol, date),
+    extract_price_keys,
+    key=lambda symbol, date: (symbol.upper(), iso_date(date)),
+)
+PREFETCH = os.getenv("STOCKS_PREFETCH") == "1"
+
+# answer_cache keeps the final answers of earlier questions, looked up by the similarity of the question text.
+# A cached answer is only reused for a question naming exactly the same tickers and numbers (dates included), so "AAPL on 2023-10-03" never answers "MSFT" or another date.
+# Plain price lookups may be paraphrased more freely than questions involving a calculation; both expire after an hour.
+# It is only used when the STOCKS_SEMANTIC_CACHE environment variable is "1" or --semantic-cache is passed, and is saved to data/semantic_cache/stocks.npz.
+
+answer_cache = SemanticCache(
+    thresholds={"get_price": 0.75, "calculate": 0.85},
+    ttls={"get_price": 3600, "calculate": 3600},
+    path=os.path.join(CACHE_DIR, "stocks.npz"),
+)
+SEMANTIC_CACHE = os.getenv("STOCKS_SEMANTIC_CACHE") == "1"
+
+# BINARY_OPS maps the binary operation names to NumPy ufuncs. They work on numbers and element-wise on arrays of numbers.
+# REDUCTIONS maps the reduction names to NumPy functions that reduce an array of numbers to a single number.
+
+BINARY_OPS = {
+    "mul": np.multiply,
+    "add": np.add,
+    "truediv": np.true_divide,
+    "sub": np.subtract,
+}
+
+REDUCTIONS = {
+    "sum": np.sum,
+    "mean": np.mean,
+    "prod": np.prod,
+    "min": np.min,
+    "max": np.max,
+}
+
+# EXPRESSION_OPERATORS and EXPRESSION_FUNCTIONS list the only operators and functions allowed in an arithmetic expression.
+# Anything else (names, attributes, comprehensions, ...) is rejected, so an expression can never run arbitrary code.
+# In an expression the reductions take either one list or several numbers, so max(3, 5) and sum(1, 2, 3) work like in Python:
+# every argument is flattened into one array, instead of the second one being passed on to NumPy as the axis.
+
+def variadic(reduction):
+    def reduce(*args):
+        if not args:
+            raise ValueError(f"{reduction.__name__}() needs at least one number")
+        return reduction(np.concatenate([np.atleast_1d(np.asarray(arg, dtype=float)) for arg in args]))
+    return reduce
+
 
-def calculate(a: float, b: float, op: str) -> float:
-    logger.info(f"Calling calculate with {a=}, {b=} and {op=}")
+EXPRESSION_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+}
+
+EXPRESSION_FUNCTIONS = {
+    **{name: variadic(reduction) for name, reduction in REDUCTIONS.items()},
+    "abs": np.abs,
+    "round": np.round,
+}
+
+# evaluate_expression parses the expression with ast.parse in "eval" mode and walks the resulting tree.
+# Numbers evaluate to floats (integers too, so NumPy never does int64 arithmetic that silently overflows, e.g. on 2**64), lists evaluate to NumPy arrays, and operators and functions are looked up in the tables above.
+
+def evaluate_expression(expression: str):
+    def evaluate(node):
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return float(node.value)
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return np.array([evaluate(element) for element in node.elts], dtype=float)
+        if isinstance(node, ast.BinOp) and type(node.op) in EXPRESSION_OPERATORS:
+            return EXPRESSION_OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in EXPRESSION_OPERATORS:
+            return EXPRESSION_OPERATORS[type(node.op)](evaluate(node.operand))
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in EXPRESSION_FUNCTIONS
+            and not node.keywords
+        ):
+            return EXPRESSION_FUNCTIONS[node.func.id](*[evaluate(arg) for arg in node.args])
+        raise ValueError(f"Unsupported element in expression: {ast.dump(node)}")
+
+    return evaluate(ast.parse(expression, mode="eval"))
+
+# calculate function evaluates a whole calculation in a single call, so multi-step arithmetic costs one model round trip.
+# logging an informational message, indicating that the calculate function is being called; displaying its arguments.
+# There are three ways of calling it:
+# 1: a, b and a binary op ("mul", "add", "truediv", "sub"). a and b can be numbers or arrays of numbers; arrays are combined element-wise.
+# 2: values and a reduction op ("sum", "mean", "prod", "min", "max") that reduces the array to one number.
+# 3: expression, a safe arithmetic expression such as "5 * 173.97 + sum([10, 20]) / 2".
+# The result is returned as a float, or as a list of floats for element-wise results.
+# Missing operands raise a ValueError instead of silently turning into NaN; the tool loop returns the error message to the model.
+
+def calculate(a=None, b=None, op: str = None, values: list = None, expression: str = None):
+    logger.info(f"Calling calculate with {a=}, {b=}, {op=}, {values=} and {expression=}")
 
-    return getattr(operator, op)(a, b)
+    if expression is not None:
+        result = evaluate_expression(expression)
+    elif op in REDUCTIONS:
+        if not values:
+            raise ValueError(f"op={op!r} needs a non-empty list of values")
+        result = REDUCTIONS[op](np.asarray(values, dtype=float))
+    elif op in BINARY_OPS:
+        if a is None or b is None:
+            raise ValueError(f"op={op!r} needs both a and b")
+        result = BINARY_OPS[op](np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    else:
+        raise ValueError(f"Unsupported calculation: {op=}")
+
+    result = np.asarray(result, dtype=float)
+    return result.item() if result.ndim == 0 else result.tolist()
 
 
 # Defining a dictionary named get_price_metadata that contains metadata information about a function called get_price.
@@ -97,101 +388,315 @@ get_price_metadata = {
 
 # Defining a dictionary named calculate_metadata that contains metadata information about a function called calculate.
 # "name": "calculate" specifies the name of the function as "calculate".
-# "description": "General purpose calculator" provides a description of what the function does.
+# "description" explains the three ways of calling the calculator, so the model can do a whole calculation in one call.
 # "parameters" is an object that contains information about the function's parameters.
 # "type": "object" indicates that the parameters are of type object.
 # "properties" is an object that defines the properties of the object parameter.
-# "a" is a property of type number that represents the first entry.
-# "b" is a property of type number that represents the second entry.
-# "op" is a property of type string that represents the binary operation. It is restricted to the values "mul", "add", "truediv", and "sub" using the enum keyword.
-# "required": ["a", "b", "op"] specifies that all three properties, "a", "b", and "op", are required when calling the calculate function.
+# "a" and "b" are numbers or arrays of numbers; arrays are combined element-wise.
+# "values" is an array of numbers for the reductions.
+# "op" is a property of type string that represents the operation. It is restricted to the binary operations and reductions using the enum keyword.
+# "expression" is a property of type string that holds a whole arithmetic expression.
+# "required": [] because which properties are needed depends on the way the calculator is called.
+
+number_or_array = {
+    "anyOf": [
+        {"type": "number"},
+        {"type": "array", "items": {"type": "number"}},
+    ],
+}
 
 calculate_metadata = {
     "name": "calculate",
-    "description": "General purpose calculator",
+    "description": "General purpose calculator. Do the whole calculation in one call: "
+    "either a binary op on a and b (numbers or arrays, applied element-wise), "
+    "a reduction op over values, or an arithmetic expression such as "
+    "'5 * 173.97 + 3 * 346.07' or 'sum([10, 20, 30]) / 3'.",
     "parameters": {
         "type": "object",
         "properties": {
             "a": {
-                "type": "number",
-                "description": "First entry",
+                **number_or_array,
+                "description": "First entry of a binary operation",
             },
             "b": {
-                "type": "number",
-                "description": "Second entry",
+                **number_or_array,
+                "description": "Second entry of a binary operation",
+            },
+            "values": {
+                "type": "array",
+                "items": {"type": "number"},
+                "description": "Numbers to reduce with a reduction operation",
             },
             "op": {
                 "type": "string",
-                "enum": ["mul", "add", "truediv", "sub"],
-                "description": "Binary operation",
+                "enum": list(BINARY_OPS) + list(REDUCTIONS),
+                "description": "Binary operation on a and b, or reduction over values",
+            },
+            "expression": {
+                "type": "string",
+                "description": "Arithmetic expression with numbers, lists, + - * / **, "
+                "and the functions sum, mean, prod, min, max, abs and round",
             },
         },
-        "required": ["a", "b", "op"],
+        "required": [],
     },
 }
 
-# Initializing a list called messages that contains dictionaries representing different messages.
-# "content": sys.argv[1] assigns the value of the command-line argument at index 1 to the "content" key. This suggests that the user message is being passed as a command-line argument.
-
-messages = [
-    {"role": "user", "content": sys.argv[1]},
-    {
-        "role": "system",
-        "content": "You are a helpful financial investor who overlooks the "
-        f"performance of stocks. Today is {TODAY}. Note that the "
-        "format of the date is YYYY/MM/DD",
+# Defining a dictionary named get_price_statistics_metadata that contains metadata information about the get_price_statistics function.
+# "description" tells the model to prefer it over many get_price and calculate calls for questions about returns, volatility, drawdowns, moving averages or correlations.
+# "symbols" is an array of ticker symbols; "start" and "end" bound the range of dates, end defaulting to today.
+# "moving_average_windows" is an optional array of window lengths in trading days.
+# "required": ["symbols", "start"] because the end date and the windows have defaults.
+
+get_price_statistics_metadata = {
+    "name": "get_price_statistics",
+    "description": "Statistics of the daily closing prices of one or more financial instruments over a range of dates, "
+    "computed in one call: total and annualized return, annualized volatility, maximum drawdown, moving averages, "
+    "best and worst days, and the correlations of daily returns between the symbols. Use it instead of many "
+    "get_price and calculate calls for any question about performance over a period.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "symbols": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Ticker symbols of the financial instruments",
+            },
+            "start": {
+                "type": "string",
+                "description": "First date of the range in the format YYYY-MM-DD",
+            },
+            "end": {
+                "type": "string",
+                "description": "Last date of the range in the format YYYY-MM-DD, today by default",
+            },
+            "moving_average_windows": {
+                "type": "array",
+                "items": {"type": "integer"},
+                "description": "Moving average lengths in trading days, [20, 50, 200] by default",
+            },
+        },
+        "required": ["symbols", "start"],
     },
-]
-
-# while True in order to create an infinite loop; the loop continuously interacts with the OpenAI Chat API.
-# includes the metadata information of the get_price and calculate functions, which might be used by the OpenAI model
-# The response from the OpenAI model is stored in the response variable.
-# The code then extracts the generated message from the response using response["choices"][0]["message"] and assigns it to the message variable.
-# Finally, the message is appended to the messages list.
-
-while True:
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo-0613",
-        temperature=0,
-        messages=messages,
-        functions=[get_price_metadata, calculate_metadata],
-    )
-    message = response["choices"][0]["message"]
-    messages.append(message)
-
-# Generating chat-based responses and continue generating responses until a generated message does not contain the substring "function_call".
-# Checking if the substring "function_call" is not present in the variable message. 
-# If the condition is true, it means that the generated message does not contain the substring "function_call".
-# If the condition is true, the break statement is executed, which terminates the loop and exits the loop block.
-    if "function_call" not in message:
-        break
-
-    # call custom functions
-    # Extracting function_name and kwargs (keyword arguments) from the message object. 
-    # The function_name is obtained from message["function_call"]["name"], 
-    # The kwargs are obtained by parsing the JSON string stored in message["function_call"]["arguments"] using json.loads().
-    function_name = message["function_call"]["name"]
-    kwargs = json.loads(message["function_call"]["arguments"])
-
-    # Checking if the value of function_name is "get_price".
-    # If the condition is true, the get_price function is called with the keyword arguments stored in kwargs.
-    # The output of the get_price function is converted to a string using str() and assigned to the output variable.
-    # If the condition is false, the calculate function is called with the keyword arguments stored in kwargs.
-    # The output of the calculate function is converted to a string using str() and assigned to the output variable.
-    if function_name == "get_price":
-        output = str(get_price(**kwargs))
-    elif function_name == "calculate":
-        output = str(calculate(**kwargs))
+}
+
+# tools registers the functions the model may call, each with its execution class.
+# get_price and get_price_statistics block on HTTP when a price is not cached yet, so they run on the registry's thread pool; calculate takes microseconds, so it runs inline, where a process pool round trip would cost more than the arithmetic.
+# The lambda looks get_price up at call time, so tests and benchmarks can replace the module-level function.
+# The registry also maps the tool names that may be used inside a plan to their functions.
+# execute_plan_metadata describes the execute_plan function: the model submits a list of steps, later steps can refer to the output of earlier ones with "$<step id>".
+# Independent steps (e.g. the prices of several symbols) are executed in parallel and all outputs come back in one function message,
+# so a multi-hop question costs one or two model round trips instead of one per tool call.
+
+tools = ToolRegistry()
+tools.register(lambda **kwargs: get_price(**kwargs), name="get_price", execution=THREAD)
+tools.register(lambda **kwargs: calculate(**kwargs), name="calculate", execution=INLINE)
+tools.register(lambda **kwargs: get_price_statistics(**kwargs), name="get_price_statistics", execution=THREAD)
+execute_plan_metadata = plan_metadata(tools)
+
+# run_conversation runs the tool loop for a single question and returns the full list of messages.
+# If a usage dictionary is passed, the token counts reported by every completion are added to it.
+# Initializing a list called messages that contains dictionaries representing different messages.
+# "content": question assigns the user's question to the "content" key of the user message.
+# The completions are requested with src.llm.chat_completion_request, like the other assistants: it waits for a slot of the adaptive rate limiter,
+# retries 429s, 5xx responses and timeouts, spreads requests over the backend pool and routes the model when MODEL_ROUTING is on.
+# Like yfinance, src.llm is only imported once a question is actually asked.
+# Every call is one trace: a "stocks.turn" span with a "chat" span per completion, a "parse_arguments" span and an "execute_tool" span per function call.
+
+@tracer.traced("stocks.turn")
+def run_conversation(question: str, usage: dict = None) -> list:
+    from src.llm import chat_completion_request
+
+    messages = [
+        {"role": "user", "content": question},
+        {
+            "role": "system",
+            "content": "You are a helpful financial investor who overlooks the "
+            f"performance of stocks. Today is {TODAY}. Note that the "
+            "format of the date is YYYY-MM-DD",
+        },
+    ]
+
+    # Answering from the semantic cache when a similar question about the same tickers and numbers was answered recently.
+    # Questions that name no ticker are never cached.
+    tickers = extract_tickers(question)
+    cache_key = tickers | numbers(question)
+    use_cache = SEMANTIC_CACHE and bool(tickers)
+    if use_cache:
+        cached = answer_cache.lookup(question, key=cache_key)
+        current_span().set_attribute("cache.hit", cached is not None)
+        if cached is not None:
+            messages.append({"role": "assistant", "content": cached})
+            return messages
+    tools_used = set()
+    tools_failed = False
+
+    # Starting the speculative price downloads before the first completion request, so they run while the model is thinking.
+    speculation = price_prefetcher.start(question) if PREFETCH else None
+
+    # while True in order to create an infinite loop; the loop continuously interacts with the OpenAI Chat API.
+    # includes the metadata information of the get_price and calculate functions, which might be used by the OpenAI model
+    # The response from the OpenAI model is stored in the response variable; responses with other 4xx statuses raise, failing the question.
+    # The code then extracts the generated message from the response using response.message and assigns it to the message variable.
+    # Finally, the message is appended to the messages list.
+
+    try:
+        while True:
+            response = chat_completion_request(
+                messages,
+                functions=[get_price_metadata, calculate_metadata, get_price_statistics_metadata, execute_plan_metadata],
+                temperature=0,
+            )
+            response.raise_for_status()
+            message = response.message
+            messages.append(message)
+
+            if usage is not None:
+                for key, value in response.usage.items():
+                    if isinstance(value, int):
+                        usage[key] = usage.get(key, 0) + value
+
+            # Generating chat-based responses and continue generating responses until a generated message does not contain the substring "function_call".
+            # Checking if the substring "function_call" is not present in the variable message. 
+            # If the condition is true, it means that the generated message does not contain the substring "function_call".
+            # If the condition is true, the break statement is executed, which terminates the loop and exits the loop block.
+            if not message.get("function_call"):
+                break
+
+            # call custom functions
+            # Extracting function_name and kwargs (keyword arguments) from the message object. 
+            # The function_name is obtained from message["function_call"]["name"], 
+            # The kwargs are obtained by parsing the JSON string stored in message["function_call"]["arguments"] using json.loads().
+            function_name = message["function_call"]["name"]
+            tools_used.add(function_name)
+
+            # Checking if the value of function_name is "get_price".
+            # If the condition is true, the get_price function is called through the tool registry with the keyword arguments stored in kwargs.
+            # The output of the get_price function is converted to a string using str() and assigned to the output variable.
+            # If the function_name is "calculate", the calculate function is called with the keyword arguments stored in kwargs.
+            # The output of the calculate function is converted to a string using str() and assigned to the output variable.
+            # If the function_name is "get_price_statistics", its result dictionary is serialized to JSON.
+            # If the function_name is "execute_plan", the submitted steps are executed and all their outputs are serialized to JSON.
+            # If the arguments cannot be parsed or the function fails, the error message becomes the function output, as for the other tools,
+            # so the model can correct its call instead of the whole turn failing.
+            try:
+                with tracer.span("parse_arguments"):
+                    kwargs = json.loads(message["function_call"]["arguments"])
+                if function_name == "get_price":
+                    if speculation is not None:
+                        speculation.mark_used(kwargs["symbol"], kwargs["date"])
+                    output = str(tools.call(function_name, **kwargs))
+                elif function_name == "calculate":
+                    output = str(tools.call(function_name, **kwargs))
+                elif function_name == "get_price_statistics":
+                    output = json.dumps(tools.call(function_name, **kwargs))
+                elif function_name == "execute_plan":
+                    if speculation is not None:
+                        for step in kwargs["steps"]:
+                            if step["tool"] == "get_price" and {"symbol", "date"} <= step["args"].keys():
+                                speculation.mark_used(step["args"]["symbol"], step["args"]["date"])
+                    output = json.dumps(execute_plan(kwargs["steps"], tools))
+                else:
+                    raise ValueError(f"function {function_name} does not exist")
+            except Exception as e:
+                logger.warning(f"{function_name} failed: {type(e).__name__}: {e}")
+                output = f"Error: {type(e).__name__}: {e}"
+                tools_failed = True
+
+            # Finally, the output is appended to the messages list.
+            messages.append({"role": "function", "name": function_name, "content": output})
+    finally:
+        # Closing the speculation even if a completion request fails, as the weather handler does, so no prefetch is left running.
+        if speculation is not None:
+            speculation.close()
+
+    # Caching the final answer under "calculate" if anything beyond price lookups was needed, so it gets the stricter threshold.
+    # Answers given after a failed function call are not cached.
+    if use_cache and tools_used and not tools_failed:
+        answer_cache.store(question, message["content"], "get_price" if tools_used == {"get_price"} else "calculate", key=cache_key)
+
+    return messages
+
+
+# answer_question runs one question and returns a JSON-serialisable record with the answer, the token usage and the latency.
+# Errors are recorded in the "error" field so that one failing question does not stop a batch.
+
+def answer_question(question: str) -> dict:
+    usage = {}
+    start = time.perf_counter()
+    record = {"question": question}
+    try:
+        messages = run_conversation(question, usage=usage)
+        record["answer"] = messages[-1]["content"]
+        record["turns"] = sum(1 for m in messages if m["role"] == "assistant")
+    except Exception as e:
+        logger.exception(f"Failed to answer {question!r}")
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - start, 3)
+    record.update(usage)
+    return record
+
+# answer_batch answers many questions concurrently with the given number of workers and yields the records in input order.
+# All workers share the price cache, so a price is downloaded once no matter how many questions need it.
+
+def answer_batch(questions, workers: int = 8):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(answer_question, questions)
+
+# Parsing the command-line arguments. Either a single question is passed as the first argument,
+# or --batch names a file with one question per line ("-" reads the questions from stdin).
+# In batch mode every answer is written as one JSON line to --output (stdout by default).
+# argv defaults to the script's own arguments; "python -m src stocks ..." passes the arguments after the subcommand.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer questions about stock prices with OpenAI function calling.")
+    parser.add_argument("question", nargs="?", help="a single question to answer")
+    parser.add_argument("--batch", metavar="PATH", help='file with one question per line, or "-" for stdin')
+    parser.add_argument("--workers", type=int, default=8, help="number of questions answered concurrently in batch mode")
+    parser.add_argument("--output", metavar="PATH", help="write the JSON lines to PATH instead of stdout")
+    parser.add_argument("--prefetch", action="store_true", help="speculatively download prices named in the questions")
+    parser.add_argument("--semantic-cache", action="store_true", help="answer paraphrases of earlier questions from the local cache")
+    args = parser.parse_args(argv)
+
+    global PREFETCH, SEMANTIC_CACHE
+    PREFETCH = PREFETCH or args.prefetch
+    SEMANTIC_CACHE = SEMANTIC_CACHE or args.semantic_cache
+    if args.batch is not None:
+        analytics.start()
+
+        # Only a file opened here is closed here; stdin belongs to the caller.
+        if args.batch == "-":
+            questions = [line.strip() for line in sys.stdin if line.strip()]
+        else:
+            with open(args.batch) as source:
+                questions = [line.strip() for line in source if line.strip()]
+
+        output = open(args.output, "w") if args.output else sys.stdout
+        try:
+            for record in answer_batch(questions, workers=args.workers):
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        if PREFETCH:
+            logger.info(f"Prefetch metrics: {price_prefetcher.snapshot()}")
+        if SEMANTIC_CACHE:
+            logger.info(f"Semantic cache metrics: {answer_cache.snapshot()}")
     else:
-        raise ValueError
-    
-    # Finally, the output is appended to the messages list.
-    messages.append({"role": "function", "name": function_name, "content": output})
-
-# Creating a list comprehension [m["role"] for m in messages] that iterates over the messages list and extracts the value of the "role" key from each dictionary in the list. 
-# The resulting list contains the values of the "role" key for each message.
-# Accessing the last element of the messages list, and then retrieves the value associated with the "content" key from that dictionary. 
-print("*" * 80)
-print([m["role"] for m in messages])
-print("*" * 80)
-print(messages[-1]["content"])
\ No newline at end of file
+        if args.question is None:
+            parser.error("either a question or --batch is required")
+
+        # Creating a list comprehension [m["role"] for m in messages] that iterates over the messages list and extracts the value of the "role" key from each dictionary in the list. 
+        # The resulting list contains the values of the "role" key for each message.
+        # Accessing the last element of the messages list, and then retrieves the value associated with the "content" key from that dictionary. 
+        messages = run_conversation(args.question)
+
+        print("*" * 80)
+        print([m["role"] for m in messages])
+        print("*" * 80)
+        print(messages[-1]["content"])
+
+if __name__ == "__main__":
+    main()
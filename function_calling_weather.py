@@ -1,5 +1,4 @@
 from openai import OpenAI
-import time
 
 # By importing load_dotenv, the code is preparing to load environment variables from a .env file, which can be useful for configuring the application or storing sensitive information.
 from dotenv import load_dotenv
@@ -9,6 +8,8 @@ import json
 # The requests module is a popular HTTP library that allows you to send HTTP requests and handle the responses in your Python code. It simplifies the process of making HTTP requests by providing a high-level interface.
 import requests
 
+from src.tracing import traced_poll, tracer
+
 # By calling load_dotenv(), the code is instructing the dotenv module to read the .env file and set the environment variables defined in it. Once loaded, these environment variables can be accessed within the Python script using os.environ or other methods.
 load_dotenv()
 
@@ -79,32 +80,35 @@ class AssistantManager:
             print(f"{role.capitalize()}: {content}")
 
     def wait_for_completion(self):
-        while True:
-            time.sleep(5)
-            run_status = self.client.beta.threads.runs.retrieve(
-                thread_id=self.thread.id,
-                run_id=self.run.id
-            )
-            print(run_status.model_dump_json(indent=4))
-
-            if run_status.status == 'completed':
-                self.process_messages()
-                break
-            elif run_status.status == 'requires_action':
-                print("Function Calling ...")
-                self.call_required_functions(run_status.required_action.submit_tool_outputs.model_dump())
-            else:
-                print("Waiting for the Assistant to process...")
+        traced_poll(
+            lambda: self.client.beta.threads.runs.retrieve(thread_id=self.thread.id, run_id=self.run.id),
+            self.on_run_status,
+            self.model,
+            self.run.id,
+        )
+
+    def on_run_status(self, run_status):
+        print(run_status.model_dump_json(indent=4))
+
+        if run_status.status == 'completed':
+            self.process_messages()
+        elif run_status.status == 'requires_action':
+            print("Function Calling ...")
+            self.call_required_functions(run_status.required_action.submit_tool_outputs.model_dump())
+        else:
+            print("Waiting for the Assistant to process...")
 
     def call_required_functions(self, required_actions):
         tool_outputs = []
 
         for action in required_actions["tool_calls"]:
             func_name = action['function']['name']
-            arguments = json.loads(action['function']['arguments'])
+            with tracer.span("parse_arguments"):
+                arguments = json.loads(action['function']['arguments'])
 
             if func_name == "get_weather_forecast":
-                output = get_weather_forecast(location=arguments['location'])
+                with tracer.span(f"execute_tool {func_name}", {"gen_ai.tool.name": func_name, "gen_ai.tool.call.id": action['id']}):
+                    output = get_weather_forecast(location=arguments['location'])
                 print(output)
                 tool_outputs.append({
                     "tool_call_id": action['id'],
@@ -1,29 +1,41 @@
-import openai
+import argparse
 import os
 
 from dotenv import load_dotenv
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-messages = [
-    {"role": "system", "content": "You are a kind helpful assistant."},
-]
-
-while True:
-    message = input("User : ")
-    if message:
-        messages.append(
-            {"role": "user", "content": message},
-        )
-        chat = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo", messages=messages
-        )
-    
-    reply = chat.choices[0].message.content
-    print(f"ChatGPT: {reply}")
-    messages.append({"role": "assistant", "content": reply})
-    
-    if "exit" in reply:
-        break
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat with ChatGPT in the terminal; the chat ends when a reply contains \"exit\".")
+    parser.add_argument("--model", default="gpt-3.5-turbo", help="chat model (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    import openai
+
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+
+    messages = [
+        {"role": "system", "content": "You are a kind helpful assistant."},
+    ]
+
+    while True:
+        message = input("User : ")
+        if message:
+            messages.append(
+                {"role": "user", "content": message},
+            )
+            chat = openai.ChatCompletion.create(
+                model=args.model, messages=messages
+            )
+        
+        reply = chat.choices[0].message.content
+        print(f"ChatGPT: {reply}")
+        messages.append({"role": "assistant", "content": reply})
+        
+        if "exit" in reply:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import os
 import json
+import uuid
+from datetime import date
 import openai
-from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, AIMessage, ChatMessage
+from src.executor import Conversation, run_tool_loop, tool_call_id
+from src.flights import FlightSchedule
+from src.write_behind import WriteBehindQueue
 
 
 # --------------------------------------------------------------
@@ -81,28 +83,32 @@ print(output)
 # Add a Function
 # --------------------------------------------------------------
 
+# The flight schedule (CSV or SQLite) is indexed in memory per route,
+# so finding the next flight is a binary search over its departure times.
+# The bundled sample timetable is moved to start today, so it always has upcoming flights.
+
+FLIGHT_SCHEDULE = os.getenv("FLIGHT_SCHEDULE")
+schedule = FlightSchedule.load(
+    FLIGHT_SCHEDULE or "data/flights.csv", start=None if FLIGHT_SCHEDULE else date.today()
+)
+
 
 def get_flight_info(loc_origin, loc_destination):
     """Get flight information between two locations."""
 
-    # Example output returned from an API or database
-    flight_info = {
-        "loc_origin": loc_origin,
-        "loc_destination": loc_destination,
-        "datetime": str(datetime.now() + timedelta(hours=2)),
-        "airline": "KLM",
-        "flight": "KL643",
-    }
+    flights = schedule.next_flights(loc_origin, loc_destination)
+    if not flights:
+        return json.dumps({"error": f"No upcoming flights from {loc_origin} to {loc_destination}"})
 
-    return json.dumps(flight_info)
+    return json.dumps(flights[0])
 
 
 # Use the LLM output to manually call the function
 # The json.loads function converts the string to a Python object
 
-origin = json.loads(output.function_call.arguments).get("loc_origin")
-destination = json.loads(output.function_call.arguments).get("loc_destination")
 params = json.loads(output.function_call.arguments)
+origin = params.get("loc_origin")
+destination = params.get("loc_destination")
 type(params)
 
 print(origin)
@@ -227,8 +233,9 @@ print(ask_and_reply(user_prompt))
 
 # Get info for the next prompt
 
-origin = json.loads(output.function_call.arguments).get("loc_origin")
-destination = json.loads(output.function_call.arguments).get("loc_destination")
+params = json.loads(output.function_call.arguments)
+origin = params.get("loc_origin")
+destination = params.get("loc_destination")
 chosen_function = eval(output.function_call.name)
 flight = chosen_function(origin, destination)
 
@@ -236,8 +243,9 @@ print(origin)
 print(destination)
 print(flight)
 
-flight_datetime = json.loads(flight).get("datetime")
-flight_airline = json.loads(flight).get("airline")
+flight_details = json.loads(flight)
+flight_datetime = flight_details.get("datetime")
+flight_airline = flight_details.get("airline")
 
 print(flight_datetime)
 print(flight_airline)
@@ -254,90 +262,130 @@ print(ask_and_reply(user_prompt))
 
 
 # --------------------------------------------------------------
-# Make It Conversational With Langchain
+# Make It Conversational With a Multi-Step Tool Executor
 # --------------------------------------------------------------
 
-llm = ChatOpenAI(model="gpt-3.5-turbo-0613", temperature=0)
+# Bookings and complaints are written behind: a tool returns once its write is
+# in the durable intent log, and a background thread commits the writes to
+# SQLite in batches. The tool call id makes a repeated call a no-op.
+
+WRITES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id TEXT PRIMARY KEY,
+    loc_origin TEXT, loc_destination TEXT, datetime TEXT, airline TEXT, flight TEXT
+);
+CREATE TABLE IF NOT EXISTS complaints (
+    complaint_id TEXT PRIMARY KEY,
+    name TEXT, email TEXT, text TEXT
+);
+"""
 
-# Start a conversation with multiple requests
 
-user_prompt = """
-This is Jane Harris. I am an unhappy customer that wants you to do several things.
-First, I neeed to know when's the next flight from Amsterdam to New York.
-Please proceed to book that flight for me.
-Also, I want to file a complaint about my missed flight. It was an unpleasant surprise. 
-Email me a copy of the complaint to jane@harris.com.
-Please give me a confirmation after all of these are done.
-"""
+def write_booking(conn, booking):
+    conn.execute(
+        "INSERT INTO bookings VALUES (:booking_id, :loc_origin, :loc_destination, :datetime, :airline, :flight)",
+        booking,
+    )
 
-# Returns the function of the first request (get_flight_info)
 
-first_response = llm.predict_messages(
-    [HumanMessage(content=user_prompt)], functions=function_descriptions_multiple
-)
+def write_complaint(conn, complaint):
+    conn.execute("INSERT INTO complaints VALUES (:complaint_id, :name, :email, :text)", complaint)
 
-print(first_response)
 
-# Returns the function of the second request (book_flight)
-# It takes all the arguments from the prompt but not the returned information
+# The seats of the schedule are only counted in memory, so on start the bookings
+# of earlier runs (committed, or still in the intent log) are taken from it again.
+# Their ids are remembered, so a retried booking is not booked twice.
 
-second_response = llm.predict_messages(
-    [
-        HumanMessage(content=user_prompt),
-        AIMessage(content=str(first_response.additional_kwargs)),
-        AIMessage(
-            role="function",
-            additional_kwargs={
-                "name": first_response.additional_kwargs["function_call"]["name"]
-            },
-            content=f"Completed function {first_response.additional_kwargs['function_call']['name']}",
-        ),
-    ],
-    functions=function_descriptions_multiple,
-)
+def load_bookings(conn):
+    for row in conn.execute("SELECT * FROM bookings"):
+        yield row["booking_id"], dict(row)
 
-print(second_response)
 
-# Returns the function of the third request (file_complaint)
+def load_complaints(conn):
+    for row in conn.execute("SELECT * FROM complaints"):
+        yield row["complaint_id"], dict(row)
 
-third_response = llm.predict_messages(
-    [
-        HumanMessage(content=user_prompt),
-        AIMessage(content=str(first_response.additional_kwargs)),
-        AIMessage(content=str(second_response.additional_kwargs)),
-        AIMessage(
-            role="function",
-            additional_kwargs={
-                "name": second_response.additional_kwargs["function_call"]["name"]
-            },
-            content=f"Completed function {second_response.additional_kwargs['function_call']['name']}",
-        ),
-    ],
-    functions=function_descriptions_multiple,
+
+def restore_write(kind, payload):
+    if kind == "booking":
+        schedule.book(payload["loc_origin"], payload["loc_destination"], payload["datetime"], payload["airline"])
+
+
+writes = WriteBehindQueue(
+    os.getenv("TOOL_WRITES_DB", "data/tool_writes.db"),
+    {"booking": write_booking, "complaint": write_complaint},
+    schema=WRITES_SCHEMA,
+    loaders={"booking": load_bookings, "complaint": load_complaints},
+    restore=restore_write,
 )
 
-print(third_response)
 
-# Conversational reply at the end of requests
+def book_flight(loc_origin, loc_destination, datetime, airline):
+    """Book a flight based on flight information."""
 
-fourth_response = llm.predict_messages(
-    [
-        HumanMessage(content=user_prompt),
-        AIMessage(content=str(first_response.additional_kwargs)),
-        AIMessage(content=str(second_response.additional_kwargs)),
-        AIMessage(content=str(third_response.additional_kwargs)),
-        AIMessage(
-            role="function",
-            additional_kwargs={
-                "name": third_response.additional_kwargs["function_call"]["name"]
-            },
-            content=f"Completed function {third_response.additional_kwargs['function_call']['name']}",
-        ),
-    ],
-    functions=function_descriptions_multiple,
+    key = tool_call_id.get() or uuid.uuid4().hex
+
+    # Takes a seat from the schedule's inventory; fails if the flight does not exist or is full
+    def reserve():
+        leg = schedule.book(loc_origin, loc_destination, datetime, airline)
+        return None if leg is None else {**leg, "booking_id": key}
+
+    try:
+        booking = writes.submit("booking", key, reserve)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    if booking is None:
+        return json.dumps({
+            "loc_origin": loc_origin,
+            "loc_destination": loc_destination,
+            "datetime": datetime,
+            "airline": airline,
+            "status": "unavailable",
+        })
+
+    return json.dumps({**booking, "status": "booked"})
+
+
+def file_complaint(name, email, text):
+    """File a complaint as a customer."""
+
+    key = tool_call_id.get() or uuid.uuid4().hex
+    complaint = writes.submit(
+        "complaint", key, lambda: {"complaint_id": key, "name": name, "email": email, "text": text}
+    )
+
+    return json.dumps({**complaint, "status": "filed"})
+
+
+available_functions = {
+    "get_flight_info": get_flight_info,
+    "book_flight": book_flight,
+    "file_complaint": file_complaint,
+}
+
+# Start a conversation with multiple requests
+
+user_prompt = """
+This is Jane Harris. I am an unhappy customer that wants you to do several things.
+First, I neeed to know when's the next flight from Amsterdam to New York.
+Please proceed to book that flight for me.
+Also, I want to file a complaint about my missed flight. It was an unpleasant surprise. 
+Email me a copy of the complaint to jane@harris.com.
+Please give me a confirmation after all of these are done.
+"""
+
+# The executor keeps one append-only conversation and loops until the model stops
+# calling functions (get_flight_info, book_flight, file_complaint, then a reply).
+# Each step only serializes the messages added since the previous step.
+
+conversation = Conversation([{"role": "user", "content": user_prompt}])
+final_response = run_tool_loop(
+    conversation, function_descriptions_multiple, available_functions, max_steps=6
 )
 
-print(fourth_response)
+for message in conversation.messages:
+    print(message)
 
-# --------------------------------------------------------------
+print(final_response["content"])
 
+writes.close()
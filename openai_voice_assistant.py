@@ -4,38 +4,182 @@
 # !pip install -q gradio
 # !pip install -q openai
 # brew install espeak
+import argparse
 import os
-import whisper
-import gradio as gr 
-import openai
-from TTS.api import TTS
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
 
 from dotenv import load_dotenv
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# torch, whisper, TTS, gradio and openai are imported where they are used and the
+# models are only loaded by main(), so importing this module (or --help) is instant.
 
 #TTS.list_models()
 
-model_name = 'tts_models/en/ljspeech/vits--neon'
-tts = TTS(model_name)
+TTS_MODEL = 'tts_models/en/ljspeech/vits--neon'
+WHISPER_MODEL = "medium"
+# whisper.audio.SAMPLE_RATE, without importing whisper.
+WHISPER_SAMPLE_RATE = 16000
+
+# Set by main() once the models are loaded.
+tts = None
+sample_rate = None
+transcriber = None
+
+
+class TranscriptionService:
+    """Queue recordings from concurrent users and transcribe them in padded mel batches.
+
+    Every recording is cut into 30 second segments; segments from all queued
+    recordings are stacked into one (batch, n_mels, frames) tensor and decoded
+    in a single pass, so N simultaneous speakers cost one batched forward pass
+    instead of N serial ones. Results are delivered through futures.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait=0.05):
+        import whisper
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.options = whisper.DecodingOptions(fp16=False, without_timestamps=True)
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="whisper-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, audio):
+        """Queue a 16 kHz float32 recording and return a future for its {"text": ...} result."""
+        future = Future()
+        self.requests.put((audio, future))
+        return future
+
+    def transcribe(self, audio):
+        return self.submit(audio).result()
+
+    def _collect_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _segments(self, audio):
+        import whisper
+
+        for start in range(0, max(len(audio), 1), whisper.audio.N_SAMPLES):
+            segment = whisper.pad_or_trim(audio[start:start + whisper.audio.N_SAMPLES])
+            yield whisper.log_mel_spectrogram(segment)
+
+    def _run(self):
+        import torch
+        import whisper
+
+        while True:
+            batch = self._collect_batch()
+            try:
+                mels = []
+                owners = []
+                for index, (audio, _) in enumerate(batch):
+                    for mel in self._segments(torch.from_numpy(audio)):
+                        mels.append(mel)
+                        owners.append(index)
+
+                results = whisper.decode(self.model, torch.stack(mels).to(self.model.device), self.options)
+
+                texts = [[] for _ in batch]
+                for owner, result in zip(owners, results):
+                    texts[owner].append(result.text.strip())
+                for (_, future), parts in zip(batch, texts):
+                    future.set_result({"text": " ".join(parts)})
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+# A sentence ends at ., ! or ? followed by whitespace. Text is only cut at a boundary
+# that has been fully received, so a sentence is never synthesized half-way through.
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# A single synthesis worker: TTS is not thread safe, but one worker is enough to
+# overlap synthesis of sentence n with the generation of sentence n+1.
+tts_executor = ThreadPoolExecutor(max_workers=1)
+
 
-tts.tts_to_file(text="I love playing Chess", file_path="output.wav")
+def synthesize(sentence):
+    """Synthesize one sentence and return it as a (sample_rate, int16 samples) tuple for gradio."""
+    samples = np.asarray(tts.tts(text=sentence), dtype=np.float32)
+    samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    return sample_rate, samples
 
-from IPython.display import Audio, display
 
-display(Audio('output.wav', autoplay=True))
+def to_whisper_audio(user_voice):
+    """Convert a gradio (sample_rate, samples) recording into the 16 kHz mono float32 array whisper expects."""
+    rate, samples = user_voice
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if np.issubdtype(samples.dtype, np.integer):
+        samples = samples / np.iinfo(samples.dtype).max
+    samples = samples.astype(np.float32)
+
+    if rate != WHISPER_SAMPLE_RATE:
+        duration = len(samples) / rate
+        target = np.linspace(0, duration, int(duration * WHISPER_SAMPLE_RATE), endpoint=False)
+        source = np.arange(len(samples)) / rate
+        samples = np.interp(target, source, samples).astype(np.float32)
+    return samples
+
+
+def stream_sentences(messages):
+    """Stream the chat completion and yield (reply_so_far, sentence) as each sentence completes."""
+    import openai
+
+    response = openai.ChatCompletion.create(
+        model="gpt-3.5-turbo", messages=messages, stream=True
+    )
+
+    reply = ""
+    pending = ""
+    for chunk in response:
+        delta = chunk.choices[0].delta.get("content")
+        if not delta:
+            continue
+        reply += delta
+        pending += delta
+
+        *sentences, pending = SENTENCE_END.split(pending)
+        for sentence in sentences:
+            if sentence.strip():
+                yield reply, sentence
+
+    if pending.strip():
+        yield reply, pending
 
-model = whisper.load_model("medium")
 
 def voice_chat(user_voice):
 
     messages = [
     {"role": "system", "content": "You are a kind helpful assistant."},
     ]
-          
-    
-    user_message = model.transcribe(user_voice)["text"]
+
+
+    # The recording arrives as an in-memory sample buffer and the reply audio is
+    # returned the same way, so no request touches the disk or shares a file.
+    user_message = transcriber.transcribe(to_whisper_audio(user_voice))["text"]
 
     #reply = user_message
 
@@ -45,29 +189,78 @@ def voice_chat(user_voice):
 
     print(messages)
 
-    chat = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo", messages=messages
-    )
-    
-    reply = chat.choices[0].message.content
-    
+    # The reply is streamed on a background thread that submits each sentence to the
+    # synthesis worker as soon as it is complete. Audio is yielded in order as soon as
+    # each synthesis finishes, whether or not the next sentence has arrived yet, so the
+    # first audio arrives after roughly one sentence.
+    sentences = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for reply, sentence in stream_sentences(messages):
+                if stop.is_set():
+                    break
+                sentences.put((reply, tts_executor.submit(synthesize, sentence)))
+        except Exception as e:
+            sentences.put(e)
+        finally:
+            sentences.put(None)
+
+    threading.Thread(target=produce, name="reply-stream", daemon=True).start()
+
+    reply = ""
+    try:
+        while (item := sentences.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            reply, future = item
+            yield reply, future.result()
+    finally:
+        # Stop submitting sentences if the listener went away mid-reply.
+        stop.set()
+
     messages.append({"role": "assistant", "content": reply})
 
-    tts.tts_to_file(text=reply, file_path="output.wav")
 
-    return(reply, 'output.wav')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Voice chat with ChatGPT: whisper transcription, streamed replies and TTS.")
+    parser.add_argument("--whisper-model", default=WHISPER_MODEL, help="whisper model size (default: %(default)s)")
+    parser.add_argument("--tts-model", default=TTS_MODEL, help="TTS model name (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="voice requests handled concurrently")
+    parser.add_argument("--share", action="store_true", help="create a public gradio link")
+    args = parser.parse_args(argv)
+
+    import gradio as gr
+    import openai
+    import torch
+    import whisper
+    from TTS.api import TTS
+
+    global tts, sample_rate, transcriber
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+
+    tts = TTS(args.tts_model)
+    sample_rate = tts.synthesizer.output_sample_rate
+
+    # Let the batched encoder/decoder matmuls use every core of the box.
+    torch.set_num_threads(os.cpu_count())
+    transcriber = TranscriptionService(whisper.load_model(args.whisper_model))
+
+    text_reply = gr.Textbox(label="ChatGPT Text")
+    voice_reply = gr.Audio(type="numpy", streaming=True, autoplay=True)
 
-text_reply = gr.Textbox(label="ChatGPT Text")
-voice_reply = gr.Audio('output.wav')
+    gr.Interface(
+        title = 'AI Voice Assistant with ChatGPT AI',
+        fn=voice_chat,
+        inputs=[
+            gr.inputs.Audio(source="microphone", type="numpy")
+        ],
 
-gr.Interface(
-    title = 'AI Voice Assistant with ChatGPT AI', 
-    fn=voice_chat, 
-    inputs=[
-        gr.inputs.Audio(source="microphone", type="filepath")
-    ],
+        outputs=[
+            text_reply,  voice_reply
+        ], live = True).queue(concurrency_count=args.concurrency).launch(debug = True, share=args.share)
 
-    outputs=[
-        text_reply,  voice_reply
-    ], live = True).launch(debug = True)
 
+if __name__ == "__main__":
+    main()
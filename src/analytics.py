@@ -0,0 +1,91 @@
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def _round(value, digits=4):
+    return round(float(value), digits)
+
+
+def _day(date):
+    return str(np.datetime64(date, "D"))
+
+
+def series_statistics(dates, closes, windows=(20, 50, 200)):
+    """Return, volatility, drawdown and moving averages of one daily close series.
+
+    ``dates`` is an ascending datetime64[D] array and ``closes`` the matching
+    float array. Returns are simple for the period and daily log returns for
+    the volatility, annualized over TRADING_DAYS.
+    """
+    if len(closes) < 2:
+        raise ValueError("Need at least two closes in the range")
+    log_returns = np.diff(np.log(closes))
+    total_return = closes[-1] / closes[0] - 1
+    drawdowns = closes / np.maximum.accumulate(closes) - 1
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(closes[: trough + 1]))
+    # Moving averages at the last date, from one cumulative sum for every window.
+    cumulative = np.concatenate(([0.0], np.cumsum(closes)))
+    daily_returns = np.expm1(log_returns)
+    best, worst = int(np.argmax(daily_returns)), int(np.argmin(daily_returns))
+
+    return {
+        "start": {"date": _day(dates[0]), "close": _round(closes[0])},
+        "end": {"date": _day(dates[-1]), "close": _round(closes[-1])},
+        "trading_days": len(closes),
+        "total_return": _round(total_return),
+        "annualized_return": _round((1 + total_return) ** (TRADING_DAYS / len(log_returns)) - 1),
+        "annualized_volatility": _round(log_returns.std(ddof=1) * np.sqrt(TRADING_DAYS)) if len(log_returns) > 1 else None,
+        "max_drawdown": {
+            "drawdown": _round(drawdowns[trough]),
+            "peak_date": _day(dates[peak]),
+            "trough_date": _day(dates[trough]),
+        },
+        "moving_averages": {
+            str(window): _round((cumulative[-1] - cumulative[-1 - window]) / window)
+            for window in windows
+            if window <= len(closes)
+        },
+        "best_day": {"date": _day(dates[best + 1]), "return": _round(daily_returns[best])},
+        "worst_day": {"date": _day(dates[worst + 1]), "return": _round(daily_returns[worst])},
+    }
+
+
+def correlations(series):
+    """Correlation matrix of daily log returns over the dates all series share.
+
+    ``series`` maps symbols to ``(dates, closes)``. Returns
+    ``{"common_days": n, "matrix": {symbol: {symbol: correlation}}}``.
+    """
+    symbols = list(series)
+    common = series[symbols[0]][0]
+    for dates, _ in series.values():
+        common = np.intersect1d(common, dates, assume_unique=True)
+    if len(common) < 3:
+        return {"common_days": len(common), "matrix": None}
+    aligned = np.stack([closes[np.searchsorted(dates, common)] for dates, closes in series.values()])
+    matrix = np.corrcoef(np.diff(np.log(aligned), axis=1))
+    return {
+        "common_days": len(common),
+        "matrix": {a: {b: _round(matrix[i, j]) for j, b in enumerate(symbols)} for i, a in enumerate(symbols)},
+    }
+
+
+def price_statistics(series, windows=(20, 50, 200)):
+    """Statistics of each series in ``series`` (symbol -> (dates, closes)), plus their correlations.
+
+    A series that cannot be analyzed (fewer than two closes) gets
+    ``{"error": message}`` and is left out of the correlations.
+    """
+    result = {"symbols": {}}
+    valid = {}
+    for symbol, (dates, closes) in series.items():
+        try:
+            result["symbols"][symbol] = series_statistics(dates, closes, windows)
+            valid[symbol] = (dates, closes)
+        except ValueError as e:
+            result["symbols"][symbol] = {"error": str(e)}
+    if len(valid) > 1:
+        result["correlations"] = correlations(valid)
+    return result
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+API_KEY_FILE = "OpenAI_API_Key.txt"
+
+
+class Backend:
+    """One API key at one base URL, with its load, latency and health."""
+
+    def __init__(self, name, base_url, api_key, weight=1.0, ewma_alpha=0.2):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.weight = weight
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.latency = None
+        self.remaining_requests = None
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probing = False
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def headers(self):
+        return {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+
+    def available(self, now):
+        if now < self.ejected_until:
+            return False
+        # After an ejection the backend takes one probe request at a time until it succeeds.
+        return not self.probing or self.in_flight == 0
+
+    def score(self):
+        """Expected wait on this backend; lower is better."""
+        latency = self.latency if self.latency is not None else 0.5
+        # Recent consecutive failures push retries towards the other backends before ejection kicks in.
+        score = (self.in_flight + 1) * latency * 2**self.failures / self.weight
+        if self.remaining_requests is not None and self.remaining_requests < 5:
+            score *= 10
+        return score
+
+    def __repr__(self):
+        return f"Backend({self.name!r}, {self.base_url!r})"
+
+
+class BackendPool:
+    """Spread requests over several API keys and base URLs.
+
+    Each request goes to the healthy backend with the lowest expected wait
+    (in-flight requests times latency EWMA, divided by weight, penalized when
+    its request quota is nearly used up). A backend that fails
+    ``max_failures`` times in a row is ejected for an exponentially growing
+    period, then receives single probe requests until one succeeds.
+    """
+
+    def __init__(self, backends, max_failures=3, base_ejection=5.0, max_ejection=300.0):
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = list(backends)
+        self.max_failures = max_failures
+        self.base_ejection = base_ejection
+        self.max_ejection = max_ejection
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build the pool from the environment.
+
+        OPENAI_BACKENDS lists "base_url|api_key" pairs separated by commas.
+        Otherwise OPENAI_API_KEYS (comma separated) or OPENAI_API_KEY, or the
+        OpenAI_API_Key.txt file, are used against OPENAI_BASE_URL.
+        """
+        base_url = os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL)
+        backends = []
+        if os.getenv("OPENAI_BACKENDS"):
+            for i, entry in enumerate(os.environ["OPENAI_BACKENDS"].split(",")):
+                url, _, key = entry.strip().partition("|")
+                backends.append(Backend(f"backend-{i}", url or base_url, key))
+        else:
+            keys = [k.strip() for k in os.getenv("OPENAI_API_KEYS", "").split(",") if k.strip()]
+            if not keys and os.getenv("OPENAI_API_KEY"):
+                keys = [os.environ["OPENAI_API_KEY"]]
+            if not keys and os.path.exists(API_KEY_FILE):
+                with open(API_KEY_FILE) as f:
+                    keys = [f.read().strip()]
+            backends = [Backend(f"key-{i}", base_url, key) for i, key in enumerate(keys or [""])]
+        return cls(backends)
+
+    def _choose(self):
+        now = time.monotonic()
+        with self.lock:
+            candidates = [b for b in self.backends if b.available(now)]
+            if not candidates:
+                # Everything is ejected: use the backend that comes back first.
+                candidates = [min(self.backends, key=lambda b: b.ejected_until)]
+            backend = min(candidates, key=Backend.score)
+            backend.in_flight += 1
+            return backend
+
+    def _release(self, backend, latency=None, headers=None, failed=False):
+        with self.lock:
+            backend.in_flight -= 1
+            if failed:
+                backend.failures += 1
+                if backend.probing or backend.failures >= self.max_failures:
+                    backend.ejections += 1
+                    backend.ejected_until = time.monotonic() + min(
+                        self.max_ejection, self.base_ejection * 2 ** (backend.ejections - 1)
+                    )
+                    backend.probing = True
+                    backend.failures = 0
+                return
+
+            backend.failures = 0
+            backend.probing = False
+            backend.ejections = 0
+            if latency is not None:
+                if backend.latency is None:
+                    backend.latency = latency
+                else:
+                    backend.latency += backend.ewma_alpha * (latency - backend.latency)
+            remaining = (headers or {}).get("x-ratelimit-remaining-requests")
+            if remaining is not None:
+                backend.remaining_requests = int(remaining)
+
+    @contextmanager
+    def lease(self):
+        """Pick a backend for one request; report the outcome with the yielded ``done(response, failed, latency)``.
+
+        If ``done`` is never called (the request raised), the request counts as failed.
+        """
+        backend = self._choose()
+        outcome = {"failed": True}
+
+        def done(response=None, failed=False, latency=None):
+            outcome.update(failed=failed, latency=latency)
+            if response is not None:
+                outcome["headers"] = {k.lower(): v for k, v in response.headers.items()}
+
+        try:
+            yield backend, done
+        finally:
+            self._release(backend, outcome.get("latency"), outcome.get("headers"), outcome["failed"])
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                {
+                    "name": b.name,
+                    "base_url": b.base_url,
+                    "in_flight": b.in_flight,
+                    "latency": b.latency,
+                    "remaining_requests": b.remaining_requests,
+                    "ejected": b.ejected_until > time.monotonic(),
+                }
+                for b in self.backends
+            ]
@@ -0,0 +1,52 @@
+"""Single entry point for the assistants: python -m src <command> [arguments].
+
+Every command imports its module, and with it the module's dependencies,
+only when it runs; the arguments after the command are passed on to it.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command -> (module with a main(argv) function, help)
+COMMANDS = {
+    "stocks": ("function_calling_stocks", "answer stock price questions, one at a time or in batches"),
+    "weather": (None, "serve the chainlit weather chat (arguments go to chainlit run)"),
+    "prices": ("src.price_store", "update or list the memory-mapped daily price store"),
+    "sql": ("src.sql_agent", "answer questions about the Chinook music database"),
+    "voice": ("openai_voice_assistant", "serve the gradio voice assistant"),
+    "chat": ("openai_basic_chat", "chat with the model in the terminal"),
+}
+
+WEATHER_APP = os.path.join(ROOT, "function_call_get_weather.py")
+
+
+def run_weather(argv):
+    try:
+        os.execvp("chainlit", ["chainlit", "run", WEATHER_APP, *argv])
+    except FileNotFoundError:
+        sys.exit("chainlit is not installed; pip install chainlit")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description=__doc__,
+        epilog="commands:\n" + "\n".join(f"  {name:<9} {help}" for name, (_, help) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="arguments of the command (see <command> --help)")
+    args = parser.parse_args(argv)
+
+    if args.command == "weather":
+        return run_weather(args.arguments)
+
+    # The scripts live next to the src package.
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    module, _ = COMMANDS[args.command]
+    sys.argv[0] = f"{parser.prog} {args.command}"
+    return importlib.import_module(module).main(args.arguments)
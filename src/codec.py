@@ -0,0 +1,61 @@
+import json
+import threading
+from collections import OrderedDict
+
+# orjson is several times faster than the json module for both directions.
+# It is optional; without it the standard library is used.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def loads(data):
+        return json.loads(data)
+
+
+# Static payload parts (functions/tools lists) keyed by id(), least recently used first. The
+# object is kept alongside its encoding so the id cannot be reused by another object; lists
+# cannot be weakly referenced, so the cache is bounded instead, for callers that build fresh
+# schemas per request.
+STATIC_CACHE_SIZE = 256
+_static_encodings = OrderedDict()
+_static_lock = threading.Lock()
+
+
+def encode_static(obj) -> bytes:
+    """Encode a payload part that does not change between requests, once per process."""
+    key = id(obj)
+    with _static_lock:
+        cached = _static_encodings.get(key)
+        if cached is not None and cached[0] is obj:
+            _static_encodings.move_to_end(key)
+            return cached[1]
+    encoded = dumps(obj)
+    with _static_lock:
+        _static_encodings[key] = (obj, encoded)
+        _static_encodings.move_to_end(key)
+        if len(_static_encodings) > STATIC_CACHE_SIZE:
+            _static_encodings.popitem(last=False)
+    return encoded
+
+
+def encode_request(fields, static_fields=None) -> bytes:
+    """Encode a JSON object from per-request fields plus pre-encoded static fields."""
+    parts = [dumps(key) + b":" + dumps(value) for key, value in fields.items() if value is not None]
+    parts += [
+        dumps(key) + b":" + encode_static(value)
+        for key, value in (static_fields or {}).items()
+        if value is not None
+    ]
+    return b"{" + b",".join(parts) + b"}"
@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    role TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_by_time ON messages (created_at);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT NOT NULL,
+    up_to_seq INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, up_to_seq)
+) WITHOUT ROWID;
+"""
+
+DEFAULT_PATH = os.getenv("CONVERSATION_DB", "data/conversations.db")
+
+
+class ConversationStore:
+    """Append-only conversation history in SQLite (WAL mode).
+
+    Messages are stored per session under an increasing sequence number, so an
+    append is a single indexed insert. The next number is read from the
+    primary key within that insert, so nothing is kept per session in memory
+    and several processes can append to the same database. Loading a session
+    only reads the most recent window plus the latest summary; older messages
+    are paged in on demand with ``load_before``.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def append(self, session_id, message):
+        """Append one message to a session and return its sequence number."""
+        with self.lock:
+            row = self.conn.execute(
+                "INSERT INTO messages (session_id, seq, created_at, role, payload) "
+                "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ? FROM messages WHERE session_id = ? "
+                "RETURNING seq",
+                (session_id, time.time(), message["role"], json.dumps(message), session_id),
+            ).fetchone()
+        return row[0]
+
+    def load_recent(self, session_id, limit=20):
+        """Return the latest summary (or None) and the last ``limit`` messages of a session, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT payload FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+            summary = self.conn.execute(
+                "SELECT content FROM summaries WHERE session_id = ? ORDER BY up_to_seq DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+        return (summary[0] if summary else None), [json.loads(row[0]) for row in reversed(rows)]
+
+    def load_before(self, session_id, before_seq, limit=20):
+        """Return up to ``limit`` (seq, message) pairs older than ``before_seq``, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, payload FROM messages WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (session_id, before_seq, limit),
+            ).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in reversed(rows)]
+
+    def add_summary(self, session_id, up_to_seq, content):
+        """Store a summary of the session's messages up to and including ``up_to_seq``."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, up_to_seq, created_at, content) VALUES (?, ?, ?, ?)",
+                (session_id, up_to_seq, time.time(), content),
+            )
+
+    def sessions_since(self, timestamp):
+        """Return the ids of the sessions with messages newer than ``timestamp``."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT session_id FROM messages WHERE created_at >= ?", (timestamp,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
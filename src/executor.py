@@ -0,0 +1,106 @@
+import time
+import uuid
+from contextvars import ContextVar
+
+from src.codec import dumps, encode_request
+from src.llm import ChatCompletionResponse, choose_model, record_response, send_completion_request
+from src.router import router
+from src.tracing import completion_span, tracer
+
+
+# Id of the tool call being executed, for tools that need an idempotency key.
+# Legacy function calls carry no id of their own; they use the conversation id and the position of
+# the step in the conversation. The id is fixed before the step's completion is requested, so a
+# retried or hedged completion, or the step run again on the same conversation, gets the same id.
+tool_call_id = ContextVar("tool_call_id", default=None)
+
+
+class Conversation:
+    """Append-only conversation that keeps its messages pre-serialized.
+
+    Every message is encoded to JSON exactly once, when it is appended, and
+    added to a cached ``[m1,m2,...`` prefix. Building the request body for the
+    next step only copies that prefix instead of serializing the whole
+    conversation again.
+
+    ``conversation_id`` (default: a random id) is part of the idempotency
+    keys of its tool calls; pass the same id when resuming a conversation.
+    """
+
+    def __init__(self, messages=(), conversation_id=None):
+        self.id = conversation_id or uuid.uuid4().hex
+        self._messages = []
+        self._encoded = bytearray(b"[")
+        for message in messages:
+            self.append(message)
+
+    def append(self, message):
+        if self._messages:
+            self._encoded += b","
+        self._encoded += dumps(message)
+        self._messages.append(message)
+
+    @property
+    def messages(self):
+        return tuple(self._messages)
+
+    def __len__(self):
+        return len(self._messages)
+
+    def encoded_messages(self):
+        """Return the conversation as a JSON array, without re-serializing any message."""
+        return bytes(self._encoded) + b"]"
+
+
+@tracer.traced("run_tool_loop")
+def run_tool_loop(conversation, functions, available_functions, model=None, max_steps=8, hedge=None):
+    """Call the model and execute the functions it asks for until it answers without a function call.
+
+    ``available_functions`` maps function names to callables taking the parsed
+    arguments as keyword arguments and returning a string. Returns the final
+    assistant message; raises RuntimeError if the model is still calling
+    functions after ``max_steps`` completions. Without ``model`` each step is
+    routed separately, so tool selection and the final answer can use
+    different models. Every completion is retried and optionally hedged like
+    chat_completion_request (``hedge``, default OPENAI_HEDGE_REQUESTS).
+    """
+    # The static part of the request is encoded once per model for the whole loop.
+    static_bodies = {}
+
+    for _ in range(max_steps):
+        step_model, decision = choose_model(model, conversation.messages, functions)
+        with completion_span(step_model, decision and decision.turn_type) as span:
+            if step_model not in static_bodies:
+                static_bodies[step_model] = (
+                    encode_request({"model": step_model}, {"functions": functions})[:-1] + b',"messages":'
+                )
+            step_id = f"{conversation.id}-{len(conversation)}"
+            start = time.monotonic()
+            response = ChatCompletionResponse(send_completion_request(
+                static_bodies[step_model] + conversation.encoded_messages() + b"}", step_model, hedge=hedge
+            ))
+            record_response(span, response)
+        response.raise_for_status()
+        if decision is not None:
+            router.observe(decision, time.monotonic() - start, response.usage)
+        message = response.message
+        conversation.append(message)
+
+        function_call = response.function_call
+        if not function_call:
+            return message
+
+        name = function_call["name"]
+        if name in available_functions:
+            arguments = response.arguments
+            token = tool_call_id.set(step_id)
+            try:
+                with tracer.span(f"execute_tool {name}", {"gen_ai.tool.name": name, "gen_ai.tool.call.id": tool_call_id.get()}):
+                    results = available_functions[name](**arguments)
+            finally:
+                tool_call_id.reset(token)
+        else:
+            results = f"Error: function {name} does not exist"
+        conversation.append({"role": "function", "name": name, "content": results})
+
+    raise RuntimeError(f"Model was still calling functions after {max_steps} steps")
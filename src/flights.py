@@ -0,0 +1,190 @@
+import csv
+import itertools
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+COLUMNS = ("origin", "destination", "departure", "airline", "flight", "seats")
+
+# City names the model sometimes passes instead of the airport code.
+AIRPORT_CODES = {
+    "AMSTERDAM": "AMS",
+    "NEW YORK": "JFK",
+    "DUSSELDORF": "DUS",
+    "DÜSSELDORF": "DUS",
+    "HAMBURG": "HAM",
+    "LONDON": "LHR",
+    "PARIS": "CDG",
+    "FRANKFURT": "FRA",
+}
+
+
+def airport_code(location):
+    location = location.strip().upper()
+    return AIRPORT_CODES.get(location, location)
+
+
+def to_minutes(value):
+    """Minutes since the epoch of a datetime or a "YYYY-MM-DD HH:MM" string.
+
+    Raises ValueError for strings in any other format.
+    """
+    try:
+        minutes = np.datetime64(value, "m")
+    except (TypeError, ValueError):
+        minutes = np.datetime64("NaT")
+    if np.isnat(minutes):
+        raise ValueError(f"Invalid date and time {value!r}, expected YYYY-MM-DD HH:MM")
+    return int(minutes.astype(np.int64))
+
+
+def format_minutes(minutes):
+    return str(np.datetime64(int(minutes), "m")).replace("T", " ")
+
+
+class FlightSchedule:
+    """Flight legs indexed by route for next-flight lookups and seat bookings.
+
+    All legs live in flat NumPy columns sorted by route and departure time; a
+    dict maps every (origin, destination) pair to its slice. Finding the next
+    flight is a binary search (``np.searchsorted``) within that slice, so a
+    lookup costs the same at a few hundred legs as at millions. Seat counts
+    are decremented under a lock, so two bookings can never sell the same
+    last seat.
+    """
+
+    def __init__(self, origins, destinations, departures, airlines, flights, seats):
+        departures = np.asarray(departures, dtype="datetime64[m]").astype(np.int64)
+        routes = [f"{o.upper()}-{d.upper()}" for o, d in zip(origins, destinations)]
+        route_names, route_ids = np.unique(routes, return_inverse=True)
+        order = np.lexsort((departures, route_ids))
+
+        self.departures = departures[order]
+        self.seats = np.asarray(seats, dtype=np.int32)[order]
+        self.airline_names, airline_ids = np.unique(np.asarray(airlines, dtype=str), return_inverse=True)
+        self.airline_ids = airline_ids.astype(np.int32)[order]
+        self.flights = np.asarray(flights, dtype=str)[order]
+
+        bounds = np.searchsorted(route_ids[order], np.arange(len(route_names) + 1))
+        self.routes = {
+            tuple(name.split("-", 1)): (int(start), int(end))
+            for name, start, end in zip(route_names, bounds[:-1], bounds[1:])
+        }
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        columns = list(zip(*rows)) or [()] * len(COLUMNS)
+        return cls(*columns)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load a CSV file with the columns origin, destination, departure, airline, flight, seats."""
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            return cls.from_rows([tuple(row[column] for column in COLUMNS) for row in reader])
+
+    @classmethod
+    def from_sqlite(cls, path, table="flights"):
+        """Load the legs from a SQLite table with the same columns as the CSV format."""
+        conn = sqlite3.connect(path)
+        try:
+            return cls.from_rows(conn.execute(f"SELECT {', '.join(COLUMNS)} FROM {table}").fetchall())
+        finally:
+            conn.close()
+
+    @classmethod
+    def load(cls, path, start=None):
+        """Load a CSV file or SQLite database; if ``start`` is given, move the timetable to begin that day."""
+        if os.path.splitext(path)[1] in (".db", ".sqlite", ".sqlite3"):
+            schedule = cls.from_sqlite(path)
+        else:
+            schedule = cls.from_csv(path)
+        if start is not None:
+            schedule.rebase(start)
+        return schedule
+
+    def rebase(self, day):
+        """Shift every leg by whole days so the first departure falls on ``day``."""
+        if len(self):
+            first = int(self.departures.min()) // 1440
+            self.departures += (to_minutes(day) // 1440 - first) * 1440
+
+    def __len__(self):
+        return len(self.departures)
+
+    def _leg(self, origin, destination, i):
+        return {
+            "loc_origin": origin,
+            "loc_destination": destination,
+            "datetime": format_minutes(self.departures[i]),
+            "airline": str(self.airline_names[self.airline_ids[i]]),
+            "flight": str(self.flights[i]),
+            "seats_available": int(self.seats[i]),
+        }
+
+    def next_flights(self, origin, destination, after=None, limit=1):
+        """The first ``limit`` legs with free seats departing at or after ``after`` (default: now)."""
+        origin, destination = airport_code(origin), airport_code(destination)
+        start, end = self.routes.get((origin, destination), (0, 0))
+        after = to_minutes(after or datetime.now())
+        i = start + int(np.searchsorted(self.departures[start:end], after))
+        # Skip sold-out legs; the seats column is scanned in chunks rather than leg by leg.
+        legs = []
+        while i < end and len(legs) < limit:
+            chunk = np.flatnonzero(self.seats[i:min(i + 256, end)] > 0)
+            legs += [self._leg(origin, destination, i + j) for j in chunk[:limit - len(legs)]]
+            i += 256
+        return legs
+
+    def book(self, origin, destination, departure, airline, seats=1):
+        """Book seats on the leg departing at ``departure`` with ``airline``; return the booked leg or None."""
+        origin, destination = airport_code(origin), airport_code(destination)
+        start, end = self.routes.get((origin, destination), (0, 0))
+        minutes = to_minutes(departure)
+        lo = start + int(np.searchsorted(self.departures[start:end], minutes))
+        hi = start + int(np.searchsorted(self.departures[start:end], minutes, side="right"))
+        airline = airline.strip().lower()
+        with self.lock:
+            for i in range(lo, hi):
+                if str(self.airline_names[self.airline_ids[i]]).lower() == airline and self.seats[i] >= seats:
+                    self.seats[i] -= seats
+                    return self._leg(origin, destination, i)
+        return None
+
+
+def write_csv(path, rows):
+    """Write legs in the format read by FlightSchedule.from_csv."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+SAMPLE_AIRLINES = {"KLM": "KL", "Delta": "DL", "Lufthansa": "LH"}
+
+
+def synthetic_rows(routes, start, days, departures_per_day=4, airlines=SAMPLE_AIRLINES, seats=180):
+    """Legs for a generated timetable: every route departs at the same times each day.
+
+    ``airlines`` maps airline names to their flight number prefix.
+    """
+    start = to_minutes(start) // 1440 * 1440
+    times = [6 * 60 + i * (16 * 60 // max(departures_per_day, 1)) for i in range(departures_per_day)]
+    flight_numbers = itertools.count(100)
+    for origin, destination in routes:
+        names = list(airlines)
+        schedule = [(t, names[k % len(names)], next(flight_numbers)) for k, t in enumerate(times)]
+        for day in range(days):
+            for t, airline, number in schedule:
+                yield (
+                    origin,
+                    destination,
+                    format_minutes(start + day * 1440 + t),
+                    airline,
+                    f"{airlines[airline]}{number}",
+                    seats,
+                )
@@ -0,0 +1,273 @@
+import os
+import time
+from contextlib import AsyncExitStack
+from functools import cached_property
+
+import requests
+from dotenv import load_dotenv
+
+from src.backends import BackendPool
+from src.codec import encode_request, loads
+from src.ratelimit import scheduler
+from src.retries import LatencyTracker, check_status, completion_retry, hedged, is_transient_status
+from src.router import router
+from src.sys_config import system_prompt
+from src.tracing import completion_span, tracer, use_span
+
+load_dotenv()
+
+GPT_MODEL = "gpt-3.5-turbo-0613"
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "60"))
+# Send a duplicate request when one is slower than the recent p95 latency.
+HEDGE_REQUESTS = os.getenv("OPENAI_HEDGE_REQUESTS", "0") == "1"
+# With MODEL_ROUTING=1 the router picks the model of requests that do not name one (see src.router);
+# off by default, so they keep using GPT_MODEL unless routing, and its cost profile, is opted into.
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "0") == "1"
+
+# Seed conversation. Callers copy it per conversation; it is never appended to.
+messages = [{"role": "system", "content": system_prompt}]
+
+functions = [
+    {
+        "name": "get_current_weather",
+        "description": "Get the current weather in a given location",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "location": {
+                    "type": "string",
+                    "description": "The city and state, e.g. San Francisco, CA",
+                },
+            },
+            "required": ["location"],
+        },
+    }
+]
+
+
+def _request_body(messages, functions=None, function_call=None, model=GPT_MODEL, tools=None, tool_choice=None, **extra):
+    # The functions/tools schemas are the same on every request; they are encoded once per process.
+    return encode_request(
+        {"model": model, "messages": messages, "function_call": function_call, "tool_choice": tool_choice, **extra},
+        {"functions": functions, "tools": tools},
+    )
+
+
+class ChatCompletionResponse:
+    """HTTP response of a chat completion whose body is parsed at most once.
+
+    ``json()`` keeps the same shape as requests/httpx responses, and the
+    assistant message fields are exposed lazily as properties.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def json(self):
+        if "_body" not in self.__dict__:
+            self._body = loads(self.response.content)
+        return self._body
+
+    @cached_property
+    def message(self):
+        return self.json()["choices"][0]["message"]
+
+    @property
+    def message_content(self):
+        # Not "content": that is the raw body of the wrapped requests/httpx response.
+        return self.message.get("content")
+
+    @property
+    def function_call(self):
+        return self.message.get("function_call")
+
+    @property
+    def tool_calls(self):
+        return self.message.get("tool_calls") or []
+
+    @cached_property
+    def arguments(self):
+        """Parsed arguments of the function call, or of each tool call."""
+        with tracer.span("parse_arguments"):
+            if self.function_call:
+                return loads(self.function_call["arguments"])
+            return [loads(call["function"]["arguments"]) for call in self.tool_calls]
+
+    @property
+    def usage(self):
+        return self.json().get("usage", {})
+
+
+latency = LatencyTracker()
+
+
+def record_response(span, response):
+    """Add the status, model and token usage of a completion response to its span."""
+    if not span.is_recording():
+        return
+    span.set_attribute("http.response.status_code", response.status_code)
+    if response.status_code == 200:
+        body = response.json()
+        usage = body.get("usage") or {}
+        span.set_attributes({
+            "gen_ai.response.model": body.get("model"),
+            "gen_ai.usage.input_tokens": usage.get("prompt_tokens"),
+            "gen_ai.usage.output_tokens": usage.get("completion_tokens"),
+        })
+
+
+def choose_model(model, messages, tools=None, tool_choice=None):
+    """Return ``(model, decision)``; the decision is None when the caller pinned the model."""
+    if model is not None:
+        return model, None
+    if not MODEL_ROUTING:
+        return GPT_MODEL, None
+    decision = router.route(messages, tools, tool_choice)
+    return decision.model, decision
+
+
+# API keys and endpoints requests are spread over; see BackendPool.from_env. OPENAI_BASE_URL
+# points them at another server, e.g. the local mock in benchmarks/.
+pool = BackendPool.from_env()
+
+
+def send_completion(body, model=GPT_MODEL, caller="default"):
+    """POST an encoded chat completion body to the least-loaded healthy backend."""
+    with pool.lease() as (backend, done):
+        # Quotas are per API key, so every backend has its own rate limiter per model.
+        with scheduler.slot(f"{backend.name}:{model}", caller) as record:
+            # Time spent waiting for the rate limiter is the gap before this span.
+            with tracer.span("POST /chat/completions", {"server.backend": backend.name}, kind=3) as span:
+                start = time.monotonic()
+                response = requests.post(
+                    backend.url("chat/completions"), headers=backend.headers(), data=body, timeout=REQUEST_TIMEOUT
+                )
+                elapsed = time.monotonic() - start
+                span.set_attribute("http.response.status_code", response.status_code)
+            record(response)
+        done(response, failed=is_transient_status(response.status_code), latency=elapsed)
+    check_status(response)
+    latency.record(elapsed)
+    return response
+
+
+@completion_retry
+def send_completion_request(body, model=GPT_MODEL, caller="default", hedge=None):
+    """send_completion with the retry policy and the optional hedging of chat_completion_request."""
+    send = lambda: send_completion(body, model, caller)
+    if HEDGE_REQUESTS if hedge is None else hedge:
+        return hedged(send, latency)
+    return send()
+
+
+def chat_completion_request(messages, functions=None, function_call=None, model=None, tools=None, tool_choice=None, caller="default", hedge=None, temperature=None):
+    """Send a chat completion request and return a ChatCompletionResponse.
+
+    Without ``model`` the router picks one for the turn (see src.router).
+
+    The request waits for a slot of the model's adaptive rate limiter; slots
+    are shared fairly between callers. Timeouts, 429s and 5xx responses are
+    retried (honouring Retry-After); other 4xx responses are returned as is.
+    With ``hedge`` (default: OPENAI_HEDGE_REQUESTS) a duplicate request is
+    sent when the first one is slower than the recent p95 latency.
+    """
+    model, decision = choose_model(model, messages, functions or tools, function_call or tool_choice)
+    with completion_span(model, decision and decision.turn_type) as span:
+        body = _request_body(messages, functions, function_call, model, tools, tool_choice, temperature=temperature)
+        start = time.monotonic()
+        response = ChatCompletionResponse(send_completion_request(body, model, caller, hedge))
+        record_response(span, response)
+    if decision is not None:
+        router.observe(decision, time.monotonic() - start, response.usage if response.ok else None)
+    return response
+
+
+# One pooled client per process, shared by every chat session.
+_async_client = None
+
+
+def async_client():
+    """The pooled async client, created (and httpx imported) on first use."""
+    global _async_client
+    if _async_client is None:
+        import httpx
+
+        _async_client = httpx.AsyncClient(timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0))
+    return _async_client
+
+
+@completion_retry
+async def achat_completion_request(messages, functions=None, function_call=None, model=None, caller="default"):
+    """Async variant of chat_completion_request that does not block the event loop.
+
+    Same contract: timeouts, 429s and 5xx responses are retried and other
+    4xx responses are returned as is.
+    """
+    model, decision = choose_model(model, messages, functions, function_call)
+    with completion_span(model, decision and decision.turn_type) as span, pool.lease() as (backend, done):
+        span.set_attribute("server.backend", backend.name)
+        async with scheduler.aslot(f"{backend.name}:{model}", caller) as record:
+            start = time.monotonic()
+            response = await async_client().post(
+                backend.url("chat/completions"),
+                headers=backend.headers(),
+                content=_request_body(messages, functions, function_call, model),
+            )
+            elapsed = time.monotonic() - start
+            record(response)
+        done(response, failed=is_transient_status(response.status_code), latency=elapsed)
+        response = ChatCompletionResponse(response)
+        record_response(span, response)
+    check_status(response)
+    latency.record(elapsed)
+    if decision is not None:
+        router.observe(decision, elapsed, response.usage if response.is_success else None)
+    return response
+
+
+async def astream_chat_completion(messages, model=None):
+    """Stream a chat completion and yield the content deltas as they arrive."""
+    model, decision = choose_model(model, messages)
+    start = time.monotonic()
+    # The span is only current while this generator runs, never across a yield to the consumer.
+    span = completion_span(model, decision and decision.turn_type).begin()
+    error = None
+    try:
+        with pool.lease() as (backend, done):
+            span.set_attributes({"server.backend": backend.name, "gen_ai.request.stream": True})
+            first_chunk = True
+            async with AsyncExitStack() as stack:
+                with use_span(span):
+                    record = await stack.enter_async_context(scheduler.aslot(f"{backend.name}:{model}"))
+                    response = await stack.enter_async_context(async_client().stream(
+                        "POST",
+                        backend.url("chat/completions"),
+                        headers=backend.headers(),
+                        content=_request_body(messages, model=model, stream=True),
+                    ))
+                    record(response)
+                    done(response, failed=is_transient_status(response.status_code))
+                    response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    with use_span(span):
+                        delta = loads(data)["choices"][0]["delta"].get("content")
+                    if delta:
+                        if first_chunk:
+                            span.set_attribute("gen_ai.response.time_to_first_chunk", time.monotonic() - start)
+                            first_chunk = False
+                        yield delta
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        span.finish(error)
+    if decision is not None:
+        router.observe(decision, time.monotonic() - start)
@@ -0,0 +1,133 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+# "$node_id" anywhere in a node's arguments refers to the output of that node. Ids are identifiers,
+# so "$a-$b" is the difference of two steps rather than a reference to a step "a-".
+REFERENCE = re.compile(r"\$([A-Za-z_]\w*)")
+STEP_ID = re.compile(r"[A-Za-z_]\w*")
+
+
+def plan_metadata(tool_names):
+    """Function metadata for execute_plan, restricted to the given tool names."""
+    return {
+        "name": "execute_plan",
+        "description": "Run several tool calls in one go. Submit a list of steps; a step can use the "
+        "output of an earlier step by writing \"$<step id>\" as an argument value or inside an "
+        "expression, e.g. {\"expression\": \"10 * $aapl\"}. Independent steps run in parallel and "
+        "all outputs are returned together.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string", "description": "Unique id of the step: letters, digits and underscores, e.g. aapl"},
+                            "tool": {"type": "string", "enum": list(tool_names)},
+                            "args": {"type": "object", "description": "Arguments of the tool call"},
+                        },
+                        "required": ["id", "tool", "args"],
+                    },
+                },
+            },
+            "required": ["steps"],
+        },
+    }
+
+
+def _references(value):
+    if isinstance(value, str):
+        return set(REFERENCE.findall(value))
+    if isinstance(value, list):
+        return set().union(*map(_references, value)) if value else set()
+    if isinstance(value, dict):
+        return set().union(*map(_references, value.values())) if value else set()
+    return set()
+
+
+def _resolve(value, outputs):
+    if isinstance(value, str):
+        whole = REFERENCE.fullmatch(value)
+        if whole:
+            return outputs[whole.group(1)]
+        return REFERENCE.sub(lambda m: str(outputs[m.group(1)]), value)
+    if isinstance(value, list):
+        return [_resolve(v, outputs) for v in value]
+    if isinstance(value, dict):
+        return {k: _resolve(v, outputs) for k, v in value.items()}
+    return value
+
+
+def execution_levels(steps):
+    """Group steps into levels; every step only depends on steps of earlier levels."""
+    ids = [step["id"] for step in steps]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Step ids must be unique")
+    invalid = [step_id for step_id in ids if not STEP_ID.fullmatch(str(step_id))]
+    if invalid:
+        raise ValueError(f"Step ids must be letters, digits and underscores: {invalid}")
+
+    dependencies = {}
+    for step in steps:
+        refs = _references(step.get("args", {}))
+        unknown = refs - set(ids)
+        if unknown:
+            raise ValueError(f"Step {step['id']} refers to unknown steps: {sorted(unknown)}")
+        dependencies[step["id"]] = refs
+
+    levels = []
+    done = set()
+    remaining = list(steps)
+    while remaining:
+        level = [step for step in remaining if dependencies[step["id"]] <= done]
+        if not level:
+            raise ValueError(f"Steps form a cycle: {sorted(s['id'] for s in remaining)}")
+        levels.append(level)
+        done.update(step["id"] for step in level)
+        remaining = [step for step in remaining if step["id"] not in done]
+    return levels, dependencies
+
+
+def execute_plan(steps, tools, max_workers=8):
+    """Execute a DAG of tool calls and return {"results": {id: output}, "errors": {id: message}}.
+
+    Steps of the same level run in parallel on a thread pool, levels run in
+    order. A step whose dependency failed is skipped and reported as an error.
+    An invalid plan (duplicate or malformed ids, unknown references, cycles)
+    runs nothing and is reported under the "plan" error key, so the model can
+    submit a corrected one.
+    """
+    try:
+        levels, dependencies = execution_levels(steps)
+    except (KeyError, TypeError, ValueError) as e:
+        return {"results": {}, "errors": {"plan": f"{type(e).__name__}: {e}"}}
+    outputs = {}
+    errors = {}
+
+    def run(step):
+        tool = tools.get(step["tool"])
+        if tool is None:
+            raise ValueError(f"Unknown tool: {step['tool']}")
+        return tool(**_resolve(step.get("args", {}), outputs))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for level in levels:
+            runnable = []
+            for step in level:
+                failed = dependencies[step["id"]] & errors.keys()
+                if failed:
+                    errors[step["id"]] = f"skipped because {sorted(failed)} failed"
+                else:
+                    runnable.append(step)
+
+            # Steps run in a copy of the caller's context, so their spans join the caller's trace.
+            futures = {step["id"]: executor.submit(copy_context().run, run, step) for step in runnable}
+            for step_id, future in futures.items():
+                try:
+                    outputs[step_id] = future.result()
+                except Exception as e:
+                    errors[step_id] = f"{type(e).__name__}: {e}"
+
+    return {"results": outputs, "errors": errors}
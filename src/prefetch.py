@@ -0,0 +1,118 @@
+import datetime
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Company names users commonly write instead of the ticker symbol.
+COMPANY_TICKERS = {
+    "apple": "AAPL",
+    "microsoft": "MSFT",
+    "google": "GOOG",
+    "alphabet": "GOOG",
+    "amazon": "AMZN",
+    "tesla": "TSLA",
+    "meta": "META",
+    "facebook": "META",
+    "nvidia": "NVDA",
+    "netflix": "NFLX",
+    "intel": "INTC",
+    "ibm": "IBM",
+}
+
+# Upper-case words that look like tickers but usually are not.
+NOT_TICKERS = {"I", "A", "USD", "EUR", "GBP", "CEO", "CFO", "ETF", "IPO", "YYYY", "MM", "DD", "OK", "US", "UK", "EU"}
+
+TICKER_PATTERN = re.compile(r"\b[A-Z]{2,5}\b")
+DATE_PATTERN = re.compile(r"\b(\d{4})[-/](\d{2})[-/](\d{2})\b")
+LOCATION_PATTERN = re.compile(r"\b(?:in|at|for)\s+([A-Z][\w'-]*(?:(?:\s+|,\s*)[A-Z][\w'-]*)*)")
+
+
+def extract_tickers(text):
+    """Return the ticker symbols a question probably refers to."""
+    tickers = {ticker for name, ticker in COMPANY_TICKERS.items() if re.search(rf"\b{name}\b", text, re.IGNORECASE)}
+    tickers.update(t for t in TICKER_PATTERN.findall(text) if t not in NOT_TICKERS)
+    return tickers
+
+
+def extract_dates(text):
+    """Return the YYYY-MM-DD dates in a question, or today's date if it names none."""
+    dates = {"-".join(parts) for parts in DATE_PATTERN.findall(text)}
+    return dates or {datetime.date.today().isoformat()}
+
+
+def extract_price_keys(text):
+    """Probable get_price(symbol, date) arguments for a stock question."""
+    return {(ticker, date) for ticker in extract_tickers(text) for date in extract_dates(text)}
+
+
+def extract_locations(text):
+    """Probable get_current_weather(location) arguments for a weather question."""
+    return {(location.strip(" ,"),) for location in LOCATION_PATTERN.findall(text)}
+
+
+class Speculation:
+    """The prefetches started for one question; tracks which of them the model actually used."""
+
+    def __init__(self, prefetcher, keys):
+        self.prefetcher = prefetcher
+        self.keys = keys
+        self.used = set()
+        self.closed = False
+
+    def mark_used(self, *args):
+        """Record that the model called the tool with these arguments."""
+        key = self.prefetcher.key(*args)
+        self.used.add(key)
+        self.prefetcher._count("hits" if key in self.keys else "misses")
+
+    def close(self):
+        """Count the prefetched keys the model never asked for as wasted fetches."""
+        if not self.closed:
+            self.closed = True
+            self.prefetcher._count("wasted", len(self.keys - self.used))
+
+
+class Prefetcher:
+    """Warm a tool's cache with arguments guessed from the user's text.
+
+    ``fetch`` is the cached tool function; calling it is what warms the cache.
+    Its cache must hold a Future per key while the fetch is in flight (as
+    ``get_price`` and ``get_current_weather`` do), so the model calling the
+    tool during a prefetch waits for it instead of fetching again.
+    ``extract`` returns the set of probable argument tuples for a text and
+    ``key`` normalizes arguments so guesses and real calls can be compared.
+    Fetches run on a small thread pool, at the same time as the first
+    completion request, and the hit/miss/wasted counts are kept in ``metrics``.
+    """
+
+    def __init__(self, fetch, extract, key=lambda *args: args, max_workers=4):
+        self.fetch = fetch
+        self.extract = extract
+        self.key = key
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        self.metrics = {"prefetched": 0, "hits": 0, "misses": 0, "wasted": 0, "errors": 0}
+
+    def _count(self, name, n=1):
+        with self.lock:
+            self.metrics[name] += n
+
+    def _fetch(self, args):
+        try:
+            self.fetch(*args)
+        except Exception:
+            self._count("errors")
+
+    def start(self, text):
+        """Start prefetching for a question and return its Speculation."""
+        guesses = self.extract(text)
+        keys = set()
+        for args in guesses:
+            keys.add(self.key(*args))
+            self.executor.submit(self._fetch, args)
+        self._count("prefetched", len(guesses))
+        return Speculation(self, keys)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.metrics)
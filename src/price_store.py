@@ -0,0 +1,243 @@
+import argparse
+import datetime
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.getenv("PRICE_STORE_DIR", "data/prices")
+
+# One .npy file per column in every symbol directory.
+COLUMNS = {
+    "date": np.dtype("datetime64[D]"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+META = "meta.json"
+LOCK = ".updater.lock"
+
+# Every column has a fixed-size .npy (format 1.0) header, so the updater can rewrite the shape in
+# place when it appends rows without moving the data.
+HEADER_SIZE = 128
+MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def npy_header(dtype, rows):
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)})
+    header = header.ljust(HEADER_SIZE - len(MAGIC) - 2 - 1) + "\n"
+    return MAGIC + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, META)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class PriceStore:
+    """Read side of the columnar daily price store.
+
+    The store has one directory per symbol with a .npy file per column
+    (date, open, high, low, close, volume) and a meta.json holding the number
+    of committed rows. Columns are opened with ``np.load(mmap_mode="r")``,
+    so every process reading the store shares the same pages of the page
+    cache instead of holding its own copy; ``history`` returns read-only
+    views. A symbol is re-opened when its meta.json changes, i.e. after the
+    updater appended rows.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        # symbol -> (meta.json mtime, rows, {column: memmap})
+        self._open = {}
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(os.path.join(self.root, name, META)))
+
+    def _columns(self, symbol):
+        directory = os.path.join(self.root, symbol)
+        try:
+            mtime = os.stat(os.path.join(directory, META)).st_mtime_ns
+        except FileNotFoundError:
+            return 0, None
+        with self.lock:
+            cached = self._open.get(symbol)
+            if cached is None or cached[0] != mtime:
+                rows = read_meta(directory)["rows"]
+                columns = {
+                    column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r") for column in COLUMNS
+                }
+                cached = self._open[symbol] = (mtime, rows, columns)
+        return cached[1], cached[2]
+
+    def date_range(self, symbol):
+        """(first, last) stored dates of ``symbol`` as datetime64[D], or None if it is not stored."""
+        rows, columns = self._columns(symbol.upper())
+        if not rows:
+            return None
+        return columns["date"][0], columns["date"][rows - 1]
+
+    def covers(self, symbol, start, end=None):
+        """Whether the stored dates of ``symbol`` span ``start`` (and ``end``, if given).
+
+        ``end`` only needs to be stored up to its last business day, so a store
+        updated on Friday still covers a range ending on the weekend.
+        """
+        stored = self.date_range(symbol)
+        if stored is None:
+            return False
+        if end is not None and np.busday_offset(np.datetime64(end, "D"), 0, roll="backward") > stored[1]:
+            return False
+        return stored[0] <= np.datetime64(start)
+
+    def history(self, symbol, start=None, end=None, columns=("date", "close")):
+        """Views of the requested columns for the rows from ``start`` to ``end`` (both included)."""
+        rows, arrays = self._columns(symbol.upper())
+        if arrays is None:
+            raise KeyError(f"{symbol} is not in the price store at {self.root}")
+        dates = arrays["date"][:rows]
+        lo = np.searchsorted(dates, np.datetime64(start), side="left") if start else 0
+        hi = np.searchsorted(dates, np.datetime64(end), side="right") if end else rows
+        return tuple(arrays[column][lo:hi] for column in columns)
+
+
+class PriceStoreUpdater:
+    """The single writer of a price store.
+
+    Holds an exclusive lock on the store for its lifetime; a second updater
+    fails instead of interleaving appends. ``append`` writes the new rows at
+    the end of every column file, rewrites the shapes in the headers, fsyncs,
+    and only then replaces meta.json, so readers never see a partial day.
+    Bytes beyond the committed rows (from a crash mid-append) are truncated
+    before the next append.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.lock_file = open(os.path.join(root, LOCK), "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            raise RuntimeError(f"Another updater is writing to {root}")
+
+    def append(self, symbol, dates, **columns):
+        """Append the rows dated after the last stored date; return how many were appended."""
+        symbol = symbol.upper()
+        directory = os.path.join(self.root, symbol)
+        os.makedirs(directory, exist_ok=True)
+        meta = read_meta(directory) or {"rows": 0}
+        rows = meta["rows"]
+
+        dates = np.asarray(dates, dtype=COLUMNS["date"])
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+        new = np.ones(len(dates), dtype=bool)
+        new[1:] = dates[1:] != dates[:-1]
+        if rows:
+            last = np.load(os.path.join(directory, "date.npy"), mmap_mode="r")[rows - 1]
+            new &= dates > last
+        if not new.any():
+            return 0
+        data = {"date": dates[new]}
+        for column in COLUMNS:
+            if column != "date":
+                values = columns.get(column)
+                values = np.full(len(dates), np.nan) if values is None else np.asarray(values, dtype=COLUMNS[column])
+                data[column] = values[order][new]
+        count = len(data["date"])
+
+        for column, dtype in COLUMNS.items():
+            path = os.path.join(directory, f"{column}.npy")
+            with open(path, "r+b" if rows else "wb") as f:
+                f.truncate(HEADER_SIZE + rows * dtype.itemsize)
+                f.seek(HEADER_SIZE + rows * dtype.itemsize)
+                f.write(data[column].astype(dtype, copy=False).tobytes())
+                f.seek(0)
+                f.write(npy_header(dtype, rows + count))
+                f.flush()
+                os.fsync(f.fileno())
+
+        temporary = os.path.join(directory, META + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump({"rows": rows + count, "first": meta.get("first", str(data["date"][0])), "last": str(data["date"][-1])}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, os.path.join(directory, META))
+        return count
+
+    def update(self, symbols, start, download=None):
+        """Download and append the days since the last stored date of every symbol."""
+        download = download or download_ohlcv
+        today = np.datetime64(datetime.date.today())
+        appended = {}
+        for symbol in symbols:
+            meta = read_meta(os.path.join(self.root, symbol.upper()))
+            first = np.datetime64(meta["last"]) + 1 if meta else np.datetime64(start)
+            if first > today:
+                appended[symbol.upper()] = 0
+                continue
+            dates, columns = download(symbol, str(first), str(today))
+            appended[symbol.upper()] = self.append(symbol, dates, **columns)
+            logger.info(f"Appended {appended[symbol.upper()]} days of {symbol.upper()}")
+        return appended
+
+    def close(self):
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def download_ohlcv(symbol, start, end):
+    """Daily OHLCV of ``symbol`` from ``start`` to ``end`` (both included), as (dates, {column: values})."""
+    import yfinance as yf
+
+    history = yf.download(symbol, start=start, end=str(np.datetime64(end) + 1), interval="1d", progress=False)
+    dates = history.index.values.astype("datetime64[D]")
+    columns = {column: history[column.capitalize()].to_numpy(dtype=float).reshape(-1) for column in COLUMNS if column != "date"}
+    valid = ~np.isnan(columns["close"])
+    return dates[valid], {column: values[valid] for column, values in columns.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the memory-mapped daily price store read by the stock assistant.")
+    parser.add_argument("--root", default=STORE_DIR, help="store directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="append the days since the last update (run one updater at a time)")
+    update.add_argument("symbols", nargs="+")
+    update.add_argument("--start", default="2015-01-01", help="first date of symbols not stored yet (default: %(default)s)")
+    commands.add_parser("info", help="list the stored symbols and their date ranges")
+    args = parser.parse_args(argv)
+
+    if args.command == "update":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        with PriceStoreUpdater(args.root) as updater:
+            print(json.dumps(updater.update(args.symbols, args.start)))
+    else:
+        for symbol in PriceStore(args.root).symbols():
+            meta = read_meta(os.path.join(args.root, symbol))
+            print(f"{symbol:<8} {meta['rows']:>6} days  {meta['first']} .. {meta['last']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Parse reset/retry durations such as "20ms", "1.5s", "6m0s" or a plain number of seconds."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class AdaptiveLimiter:
+    """AIMD limit on the number of in-flight requests for one model.
+
+    Every successful response grows the limit by 1/limit (about +1 per round
+    trip's worth of requests); a 429, or a response saying the remaining
+    request/token quota is nearly used up, halves it and pauses new requests
+    until the advertised reset. Waiting callers are served round-robin, so
+    one busy caller cannot starve the others.
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=64, decrease_factor=0.5, low_token_watermark=2000):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.low_token_watermark = low_token_watermark
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.condition = threading.Condition()
+        self.waiting = OrderedDict()
+
+    def _capacity(self):
+        capacity = int(self.limit)
+        if self.remaining_requests is not None:
+            capacity = min(capacity, max(self.remaining_requests, 1))
+        return max(capacity, self.min_limit)
+
+    def _next_caller(self):
+        """Rotate through callers with waiters so each gets a slot in turn."""
+        caller, tickets = next(iter(self.waiting.items()))
+        ticket = tickets.popleft()
+        self.waiting.pop(caller)
+        if tickets:
+            self.waiting[caller] = tickets
+        return ticket
+
+    def _grant(self):
+        now = time.monotonic()
+        while self.waiting and self.in_flight < self._capacity() and now >= self.paused_until:
+            ticket = self._next_caller()
+            ticket["granted"] = True
+            self.in_flight += 1
+            if "future" in ticket:
+                ticket["loop"].call_soon_threadsafe(_resolve, ticket["future"])
+        self.condition.notify_all()
+
+    def acquire(self, caller="default"):
+        with self.condition:
+            ticket = {"granted": False}
+            self.waiting.setdefault(caller, deque()).append(ticket)
+            self._grant()
+            while not ticket["granted"]:
+                timeout = max(self.paused_until - time.monotonic(), 0) or None
+                self.condition.wait(timeout)
+                self._grant()
+
+    async def aacquire(self, caller="default"):
+        """Async variant of acquire, waiting on a future rather than a thread.
+
+        If the waiting task is cancelled, its ticket is withdrawn, or the slot
+        it was granted meanwhile is returned, so no capacity leaks.
+        """
+        loop = asyncio.get_running_loop()
+        with self.condition:
+            ticket = {"granted": False, "loop": loop, "future": loop.create_future()}
+            self.waiting.setdefault(caller, deque()).append(ticket)
+            self._grant()
+        try:
+            while True:
+                with self.condition:
+                    if ticket["granted"]:
+                        return
+                    timeout = max(self.paused_until - time.monotonic(), 0) or None
+                await asyncio.wait({ticket["future"]}, timeout=timeout)
+                with self.condition:
+                    # Wakes up when a pause ends, since no release may come to end it.
+                    self._grant()
+        except asyncio.CancelledError:
+            with self.condition:
+                if ticket["granted"]:
+                    self.in_flight -= 1
+                else:
+                    tickets = self.waiting.get(caller)
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self.waiting[caller]
+                self._grant()
+            raise
+
+    def release(self, status_code=None, headers=None):
+        """Free the slot and adapt the limit to the response status and rate-limit headers."""
+        headers = headers or {}
+        with self.condition:
+            self.in_flight -= 1
+
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_requests is not None:
+                self.remaining_requests = int(remaining_requests)
+            if remaining_tokens is not None:
+                self.remaining_tokens = int(remaining_tokens)
+
+            exhausted = status_code == 429 or self.remaining_requests == 0 or (
+                self.remaining_tokens is not None and self.remaining_tokens < self.low_token_watermark
+            )
+            if exhausted:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                wait = parse_duration(headers.get("retry-after")) or parse_duration(
+                    headers.get("x-ratelimit-reset-requests") if self.remaining_requests == 0
+                    else headers.get("x-ratelimit-reset-tokens")
+                )
+                if wait:
+                    self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                    # Quota is refilled by the time the pause ends.
+                    self.remaining_requests = None
+            elif status_code is not None and status_code < 500:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._grant()
+
+
+class RateLimitScheduler:
+    """One AdaptiveLimiter per model, created on first use."""
+
+    def __init__(self, **limiter_options):
+        self.limiter_options = limiter_options
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, model):
+        with self.lock:
+            if model not in self.limiters:
+                self.limiters[model] = AdaptiveLimiter(**self.limiter_options)
+            return self.limiters[model]
+
+    @contextmanager
+    def slot(self, model, caller="default"):
+        """Hold an in-flight slot for ``model``; call the yielded function with the response."""
+        limiter = self.limiter(model)
+        limiter.acquire(caller)
+        outcome = {}
+        try:
+            yield _recorder(outcome)
+        finally:
+            limiter.release(outcome.get("status_code"), outcome.get("headers"))
+
+    @asynccontextmanager
+    async def aslot(self, model, caller="default"):
+        """Async variant of slot; waiting for a slot does not block the event loop."""
+        limiter = self.limiter(model)
+        await limiter.aacquire(caller)
+        outcome = {}
+        try:
+            yield _recorder(outcome)
+        finally:
+            limiter.release(outcome.get("status_code"), outcome.get("headers"))
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _recorder(outcome):
+    def record(response):
+        outcome["status_code"] = response.status_code
+        outcome["headers"] = {k.lower(): v for k, v in response.headers.items()}
+    return record
+
+
+scheduler = RateLimitScheduler()
@@ -0,0 +1,115 @@
+import sys
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+
+import numpy as np
+import requests
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from src.ratelimit import parse_duration
+
+# 408 timeout, 409 conflict, 429 rate limit and server errors are transient.
+# Every other 4xx is a problem with the request itself and is never retried.
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+TRANSIENT_ERRORS = (requests.Timeout, requests.ConnectionError)
+
+
+class RetryableStatusError(Exception):
+    """A response with a transient status code; carries the response and its Retry-After hint."""
+
+    def __init__(self, response):
+        self.response = response
+        self.retry_after = parse_duration(response.headers.get("retry-after"))
+        super().__init__(f"Retryable HTTP status {response.status_code}")
+
+
+def is_transient_status(status_code):
+    return status_code in RETRYABLE_STATUS or status_code >= 500
+
+
+def check_status(response):
+    """Raise RetryableStatusError for transient statuses; return the response otherwise."""
+    if is_transient_status(response.status_code):
+        raise RetryableStatusError(response)
+    return response
+
+
+def is_retryable(exception):
+    if isinstance(exception, (RetryableStatusError, *TRANSIENT_ERRORS)):
+        return True
+    # httpx is only imported by the async helpers; when it is not loaded the error cannot be one of its.
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(exception, (httpx.TimeoutException, httpx.TransportError))
+
+
+_backoff = wait_random_exponential(multiplier=1, max=40)
+
+
+def wait_retry_after(retry_state):
+    """Wait as long as the server asked with Retry-After, else back off exponentially with jitter."""
+    exception = retry_state.outcome.exception()
+    hint = getattr(exception, "retry_after", None)
+    if hint is not None:
+        return min(hint, 60)
+    return _backoff(retry_state)
+
+
+# Shared retry policy of the completion helpers.
+completion_retry = retry(
+    retry=retry_if_exception(is_retryable),
+    wait=wait_retry_after,
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+
+
+class LatencyTracker:
+    """Sliding window of request latencies used to pick the hedging delay."""
+
+    def __init__(self, window=200, min_samples=20, percentile=95, default_delay=2.0):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def hedge_delay(self):
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return self.default_delay
+            return float(np.percentile(self.samples, self.percentile))
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def hedged(send, tracker):
+    """Call ``send()``; if it has not finished after the tracker's p95 latency, send a duplicate.
+
+    Returns the result of whichever attempt succeeds first. The slower attempt
+    is left to finish in the background and its result is discarded.
+    """
+    # Each attempt runs in a copy of the caller's context, so its spans join the caller's trace.
+    first = _hedge_executor.submit(copy_context().run, send)
+    try:
+        return first.result(timeout=tracker.hedge_delay())
+    except FutureTimeoutError:
+        pass
+
+    pending = {first, _hedge_executor.submit(copy_context().run, send)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = error or future.exception()
+    raise error
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+
+from src.codec import encode_static
+from src.retries import LatencyTracker
+
+# USD per 1K tokens and context window of the models the scripts use.
+MODEL_PROFILES = {
+    "gpt-3.5-turbo-1106": {"input_cost": 0.001, "output_cost": 0.002, "context": 16385},
+    "gpt-3.5-turbo-0613": {"input_cost": 0.0015, "output_cost": 0.002, "context": 4096},
+    "gpt-3.5-turbo": {"input_cost": 0.0015, "output_cost": 0.002, "context": 4096},
+    "gpt-4-1106-preview": {"input_cost": 0.01, "output_cost": 0.03, "context": 128000},
+}
+
+FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "gpt-3.5-turbo-1106")
+STRONG_MODEL = os.getenv("ROUTER_STRONG_MODEL", "gpt-4-1106-preview")
+# p95 latency (seconds) above which answer turns fall back to the fast model.
+LATENCY_BUDGET = float(os.getenv("ROUTER_LATENCY_BUDGET", "20"))
+# JSON lines file every routing decision is appended to, if set.
+DECISION_LOG = os.getenv("ROUTER_DECISION_LOG")
+
+
+def estimate_tokens(messages, tools=None):
+    """Rough prompt size in tokens (about 4 characters per token)."""
+    chars = sum(len(m.get("content") or "") + 16 for m in messages)
+    if tools:
+        chars += len(encode_static(tools))
+    return chars // 4
+
+
+def turn_type(messages, tools=None, tool_choice=None):
+    """Classify a request as a "tool_selection" or an "answer" turn.
+
+    A turn that offers tools and follows a user message is expected to pick a
+    tool; a turn that follows tool results, or offers no tools, is expected to
+    produce the natural-language answer.
+    """
+    if not tools or tool_choice == "none":
+        return "answer"
+    last_role = messages[-1]["role"] if messages else "user"
+    if last_role in ("function", "tool") and tool_choice in (None, "auto"):
+        return "answer"
+    return "tool_selection"
+
+
+@dataclass
+class Decision:
+    model: str
+    reason: str
+    turn_type: str
+    prompt_tokens: int
+    tool_count: int
+    created_at: float = field(default_factory=time.time)
+    latency: float = None
+    usage: dict = None
+    cost: float = None
+
+
+class ModelRouter:
+    """Pick the model for each completion request and record why.
+
+    Tool-selection turns go to the fast, cheap model unless the prompt does
+    not fit its context or offers more tools than it handles reliably. Answer
+    turns go to the strong model unless its observed p95 latency is over the
+    budget. Every decision is kept, with the latency and cost of the request
+    once it is observed, for ``summary()`` and the optional decision log.
+    """
+
+    def __init__(self, fast_model=FAST_MODEL, strong_model=STRONG_MODEL, max_fast_tools=8,
+                 latency_budget=LATENCY_BUDGET, log_path=DECISION_LOG, history=1000):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.max_fast_tools = max_fast_tools
+        self.latency_budget = latency_budget
+        self.log_path = log_path
+        self.latencies = {}
+        self.decisions = deque(maxlen=history)
+        self.lock = threading.Lock()
+
+    def _context(self, model):
+        return MODEL_PROFILES.get(model, {}).get("context", 4096)
+
+    def _p95(self, model):
+        tracker = self.latencies.get(model)
+        if tracker is None or len(tracker.samples) < tracker.min_samples:
+            return None
+        return tracker.hedge_delay()
+
+    def route(self, messages, tools=None, tool_choice=None):
+        """Return the Decision for one request; ``tools`` is the functions or tools list."""
+        kind = turn_type(messages, tools, tool_choice)
+        tokens = estimate_tokens(messages, tools)
+        tool_count = len(tools or ())
+        fits_fast = tokens < self._context(self.fast_model) * 0.75
+
+        if not fits_fast:
+            model, reason = self.strong_model, "prompt too large for the fast model"
+        elif kind == "tool_selection" and tool_count > self.max_fast_tools:
+            model, reason = self.strong_model, f"{tool_count} tools offered"
+        elif kind == "tool_selection":
+            model, reason = self.fast_model, "tool selection"
+        elif (self._p95(self.strong_model) or 0) > self.latency_budget:
+            model, reason = self.fast_model, "strong model over latency budget"
+        else:
+            model, reason = self.strong_model, "final answer"
+        return Decision(model, reason, kind, tokens, tool_count)
+
+    def observe(self, decision, latency, usage=None):
+        """Record the outcome of a routed request."""
+        decision.latency = latency
+        decision.usage = usage or None
+        if usage and decision.model in MODEL_PROFILES:
+            profile = MODEL_PROFILES[decision.model]
+            decision.cost = (
+                usage.get("prompt_tokens", 0) * profile["input_cost"]
+                + usage.get("completion_tokens", 0) * profile["output_cost"]
+            ) / 1000
+        with self.lock:
+            self.latencies.setdefault(decision.model, LatencyTracker()).record(latency)
+            self.decisions.append(decision)
+            if self.log_path:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(asdict(decision)) + "\n")
+
+    def summary(self):
+        """Requests, mean latency and total cost per model over the recorded decisions."""
+        with self.lock:
+            decisions = list(self.decisions)
+        counts = Counter(d.model for d in decisions)
+        return {
+            model: {
+                "requests": count,
+                "mean_latency": sum(d.latency for d in decisions if d.model == model) / count,
+                "cost": sum(d.cost or 0 for d in decisions if d.model == model),
+                "reasons": dict(Counter(d.reason for d in decisions if d.model == model)),
+            }
+            for model, count in counts.items()
+        }
+
+
+router = ModelRouter()
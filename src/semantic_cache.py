@@ -0,0 +1,223 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Each script persists its cache as <name>.npz in this directory.
+CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", "data/semantic_cache")
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# Filler words that make unrelated questions look alike and paraphrases look different.
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "it", "its", "s", "in", "at", "on", "of", "for", "to",
+    "what", "how", "like", "i", "me", "my", "do", "does", "please", "tell", "right", "now", "today",
+}
+
+
+def embed(text, dim=2048):
+    """Hashed bag of word unigrams, word bigrams and character trigrams, L2-normalized.
+
+    Stop words are dropped first. Purely local and deterministic across
+    processes (crc32, not the salted built-in hash), so persisted vectors
+    stay comparable.
+    """
+    words = [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not grams:
+        return vector
+    hashes = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint32, count=len(grams))
+    # The top bit picks the sign so colliding grams tend to cancel out instead of adding up.
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def numbers(text):
+    """The numbers in a text; questions that differ in a number must not share an answer."""
+    return set(NUMBER_PATTERN.findall(text))
+
+
+# Words that change the answer while barely changing the wording ("opening" vs "closing" price,
+# "today" vs "tomorrow", "plus" vs "minus"), mapped to a canonical form.
+QUALIFIERS = {
+    **dict.fromkeys(["open", "opening", "opened"], "open"),
+    **dict.fromkeys(["close", "closing", "closed"], "close"),
+    **dict.fromkeys(["high", "highest", "peak"], "high"),
+    **dict.fromkeys(["low", "lowest", "bottom"], "low"),
+    **dict.fromkeys(["volume", "traded"], "volume"),
+    **dict.fromkeys(["today", "tonight", "now", "currently", "current"], "today"),
+    **dict.fromkeys(["tomorrow"], "tomorrow"),
+    **dict.fromkeys(["yesterday"], "yesterday"),
+    **dict.fromkeys(["week", "weekly", "weekend"], "week"),
+    **dict.fromkeys(["month", "monthly"], "month"),
+    **dict.fromkeys(["year", "yearly", "annual", "annualized"], "year"),
+    **dict.fromkeys(["last", "previous", "past"], "last"),
+    **dict.fromkeys(["next", "coming"], "next"),
+    **dict.fromkeys(["forecast"], "forecast"),
+    **dict.fromkeys(["plus", "add", "added", "sum", "total"], "+"),
+    **dict.fromkeys(["minus", "subtract", "difference", "change"], "-"),
+    **dict.fromkeys(["times", "multiplied", "product", "shares", "worth", "value"], "*"),
+    **dict.fromkeys(["divided", "ratio", "per"], "/"),
+    **dict.fromkeys(["percent", "percentage", "return", "returns"], "%"),
+    **dict.fromkeys(["average", "mean"], "mean"),
+    **dict.fromkeys(["celsius"], "celsius"),
+    **dict.fromkeys(["fahrenheit"], "fahrenheit"),
+    **dict.fromkeys(["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"], None),
+}
+# Arithmetic operators written as standalone symbols ("5 * 3"), not as parts of dates ("2023-11-01").
+OPERATOR_PATTERN = re.compile(r"(?<![\w/-])([-+*/x%])(?![\w/-])")
+
+
+def qualifiers(text):
+    """The answer-changing words of a text in canonical form; part of every cache key."""
+    found = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in QUALIFIERS:
+            found.add(QUALIFIERS[word] or word)
+    found.update(OPERATOR_PATTERN.findall(text.lower()))
+    return {f"~{word}" for word in found}
+
+
+class SemanticCache:
+    """Answers to earlier questions, looked up by cosine similarity of their embeddings.
+
+    Every entry is stored under the tool that produced it and a ``key`` of
+    entities (locations, tickers, numbers...) that must match exactly, so a
+    paraphrase hits but "weather in Boston" never returns Glasgow's weather.
+    The qualifiers of the text (open/close, today/tomorrow, operators...) are
+    added to the key, since hashed n-grams barely tell such questions apart.
+    The similarity threshold and time to live are configurable per tool. The
+    index is a brute-force matrix of unit vectors; expired entries are dropped
+    and the least recently used ones are evicted beyond ``max_entries``.
+    With a ``path`` the cache is loaded at start and saved periodically and
+    at exit.
+    """
+
+    def __init__(self, thresholds=None, ttls=None, default_threshold=0.9, default_ttl=3600.0,
+                 max_entries=10000, path=None, dim=2048, save_interval=30.0):
+        self.thresholds = thresholds or {}
+        self.ttls = ttls or {}
+        self.default_threshold = default_threshold
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.dim = dim
+        self.save_interval = save_interval
+        # Row i of the buffer is the unit vector of entries[i]; it grows by doubling.
+        self._buffer = np.zeros((64, dim), dtype=np.float32)
+        self.entries = []
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._last_save = time.monotonic()
+        self._dirty = False
+        if path:
+            if os.path.exists(path):
+                self.load()
+            atexit.register(self.save)
+
+    @property
+    def vectors(self):
+        return self._buffer[:len(self.entries)]
+
+    def _threshold(self, tool):
+        return self.thresholds.get(tool, self.default_threshold)
+
+    @staticmethod
+    def _key(key, text):
+        return sorted({str(part).strip().lower() for part in key} | qualifiers(text))
+
+    def lookup(self, text, key=()):
+        """Return the cached answer for a similar question with the same key, or None."""
+        query = embed(text, self.dim)
+        key = self._key(key, text)
+        now = time.time()
+        with self.lock:
+            if self.entries:
+                scores = self.vectors @ query
+                floor = min(self.default_threshold, *self.thresholds.values())
+                for i in np.argsort(-scores):
+                    if scores[i] < floor:
+                        break
+                    entry = self.entries[i]
+                    if entry["key"] == key and entry["expires_at"] > now and scores[i] >= self._threshold(entry["tool"]):
+                        entry["last_used"] = now
+                        self.stats["hits"] += 1
+                        return entry["answer"]
+            self.stats["misses"] += 1
+        return None
+
+    def store(self, text, answer, tool=None, key=()):
+        """Cache the answer to a question produced with ``tool``."""
+        now = time.time()
+        entry = {
+            "text": text,
+            "answer": answer,
+            "tool": tool,
+            "key": self._key(key, text),
+            "expires_at": now + self.ttls.get(tool, self.default_ttl),
+            "last_used": now,
+        }
+        with self.lock:
+            if len(self.entries) == len(self._buffer):
+                self._buffer = np.concatenate([self._buffer, np.zeros_like(self._buffer)])
+            self._buffer[len(self.entries)] = embed(text, self.dim)
+            self.entries.append(entry)
+            self.stats["stores"] += 1
+            self._dirty = True
+            self._evict(now)
+            save = self.path and time.monotonic() - self._last_save >= self.save_interval
+        if save:
+            self.save()
+
+    def _evict(self, now):
+        keep = np.array([entry["expires_at"] > now for entry in self.entries], dtype=bool)
+        overflow = int(keep.sum()) - self.max_entries
+        if overflow > 0:
+            last_used = np.array([entry["last_used"] for entry in self.entries])
+            live = np.flatnonzero(keep)
+            keep[live[np.argsort(last_used[live])[:overflow]]] = False
+        if not keep.all():
+            self.stats["evictions"] += int((~keep).sum())
+            kept_vectors = self.vectors[keep]
+            self._buffer[:len(kept_vectors)] = kept_vectors
+            self.entries = [entry for entry, kept in zip(self.entries, keep) if kept]
+
+    def save(self):
+        """Write the cache atomically to ``path`` (vectors plus JSON metadata)."""
+        with self.lock:
+            if not self._dirty:
+                return
+            self._evict(time.time())
+            vectors, metadata = self.vectors.copy(), json.dumps(self.entries)
+            self._last_save = time.monotonic()
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, vectors=vectors, metadata=np.array(metadata))
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        with np.load(self.path) as data:
+            vectors, entries = data["vectors"], json.loads(str(data["metadata"]))
+        if vectors.shape[1:] != (self.dim,):
+            return
+        with self.lock:
+            self._buffer = np.zeros((max(64, len(entries) * 2), self.dim), dtype=np.float32)
+            self._buffer[:len(entries)] = vectors
+            self.entries = entries
+            self._evict(time.time())
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries)}
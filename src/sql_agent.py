@@ -0,0 +1,93 @@
+import argparse
+import os
+import sqlite3
+
+from src.tracing import tracer
+
+DEFAULT_DB = os.getenv("CHINOOK_DB", "data/Chinook.db")
+SYSTEM_PROMPT = "Answer user questions by generating SQL queries against the Chinook Music Database."
+
+
+def database_schema(conn):
+    """Describe every table and its columns, one "Table: ...\\nColumns: ..." block per table."""
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
+    return "\n".join(
+        f"Table: {table}\nColumns: {', '.join(column[1] for column in conn.execute(f'PRAGMA table_info({table!r});'))}"
+        for table in tables
+    )
+
+
+def database_tools(schema):
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": "ask_database",
+                "description": "Use this function to answer user questions about music. Input should be a fully formed SQL query.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": f"""
+                                SQL query extracting info to answer the user's question.
+                                SQL should be written using this database schema:
+                                {schema}
+                                The query should be returned in plain text, not in JSON.
+                                """,
+                        }
+                    },
+                    "required": ["query"],
+                },
+            },
+        }
+    ]
+
+
+def ask_database(conn, query):
+    """Run a query and return its rows as a string, or the error message."""
+    try:
+        return str(conn.execute(query).fetchall())
+    except Exception as e:
+        return f"query failed with error: {e}"
+
+
+@tracer.traced("sql_agent.ask")
+def ask(question, db_path=DEFAULT_DB, max_steps=5):
+    """Answer a question about the database, running the queries the model asks for."""
+    from src.llm import chat_completion_request
+
+    # The model writes the SQL, so the database is opened read-only.
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tools = database_tools(database_schema(conn))
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": question}]
+        for _ in range(max_steps):
+            response = chat_completion_request(messages, tools=tools)
+            response.raise_for_status()
+            messages.append(response.message)
+            if not response.tool_calls:
+                return response.message_content
+            for call, arguments in zip(response.tool_calls, response.arguments):
+                name = call["function"]["name"]
+                if name == "ask_database":
+                    with tracer.span(f"execute_tool {name}", {"gen_ai.tool.name": name, "gen_ai.tool.call.id": call["id"]}):
+                        results = ask_database(conn, arguments["query"])
+                else:
+                    results = f"Error: function {name} does not exist"
+                messages.append({"role": "tool", "tool_call_id": call["id"], "name": name, "content": results})
+        raise RuntimeError(f"Model was still querying the database after {max_steps} steps")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer questions about the Chinook music database with SQL tool calls.")
+    parser.add_argument("question", help='e.g. "Who are the top 5 artists by number of tracks?"')
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database (default: %(default)s)")
+    args = parser.parse_args(argv)
+    print(ask(args.question, args.db))
+
+
+if __name__ == "__main__":
+    main()
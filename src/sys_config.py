@@ -0,0 +1,27 @@
+# System prompt that seeds every conversation with the weather bot.
+system_prompt = (
+    "You are a helpful weather assistant. Use the get_current_weather function "
+    "whenever the user asks about the weather in a location. Don't make assumptions "
+    "about what values to plug into functions. Ask for clarification if a user "
+    "request is ambiguous."
+)
+
+# Prompt used to turn a raw function result into a natural language answer.
+# <query> is replaced by the user's message and <api_result> by the JSON result of the function call.
+conv_prompt = """
+The user asked: <query>
+
+The weather API returned the following JSON result:
+<api_result>
+
+Answer the user's question in one or two friendly sentences using only the
+information in the result. If the result is empty, say that the weather for
+that location could not be found.
+"""
+
+# Local response template for well-structured weather results. Rendering it
+# answers the user without a second round trip to the model.
+weather_template = (
+    "It is currently {temperature}°F in {location} with {description_lower} "
+    "conditions and {humidity}% humidity."
+)
@@ -0,0 +1,178 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from collections.abc import Mapping
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.tracing import tracer
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+
+# NumPy arguments at least this large go to process tools through shared memory instead of the pipe.
+SHARED_MEMORY_THRESHOLD = 1 << 20
+
+
+class SharedArray:
+    """Picklable handle of an array copied into a shared memory block."""
+
+    def __init__(self, array):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=self.shm.buf)[...] = array
+        self.name, self.shape, self.dtype = self.shm.name, array.shape, array.dtype
+
+    def __getstate__(self):
+        return {"name": self.name, "shape": self.shape, "dtype": self.dtype}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = None
+
+    def load(self):
+        """Copy the array out of the block (in the worker)."""
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            return np.array(np.ndarray(self.shape, self.dtype, buffer=shm.buf))
+        finally:
+            shm.close()
+
+    def release(self):
+        """Free the block (in the parent, once the call is done)."""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _share(value):
+    if isinstance(value, np.ndarray) and value.nbytes >= SHARED_MEMORY_THRESHOLD:
+        return SharedArray(value)
+    return value
+
+
+def _call_in_worker(fn, kwargs):
+    kwargs = {key: value.load() if isinstance(value, SharedArray) else value for key, value in kwargs.items()}
+    return fn(**kwargs)
+
+
+class ToolRegistry(Mapping):
+    """Tools by name, each run according to its execution class.
+
+    ``inline`` tools run on the calling thread (cheap, pure-Python work),
+    ``thread`` tools on a shared thread pool (I/O: HTTP, SQLite) and
+    ``process`` tools on a warm process pool, so CPU-heavy NumPy or pandas
+    work uses every core and never holds the GIL of the chat loop. Process
+    tools must be importable module-level functions; large array arguments
+    are passed through shared memory rather than pickled.
+
+    The registry is a mapping of name to a blocking callable, so it can be
+    passed wherever a dict of tools is expected (run_tool_loop,
+    execute_plan). ``submit`` returns a future and ``acall`` can be awaited
+    from an event loop.
+
+    The process pool is started by the first process call, or ahead of time
+    by ``start``, never by ``register``: its workers import the main module
+    again, so a pool started while a module registers its tools would start
+    pools of its own in every worker.
+    """
+
+    def __init__(self, max_threads=8, max_processes=None):
+        self.tools = {}
+        self.max_threads = max_threads
+        self.max_processes = max_processes or os.cpu_count()
+        self._threads = None
+        self._processes = None
+        self._processes_lock = threading.Lock()
+
+    def register(self, fn=None, *, name=None, execution=INLINE):
+        """Register ``fn`` under ``name`` (default: its __name__); usable as a decorator."""
+        if fn is None:
+            return partial(self.register, name=name, execution=execution)
+        if execution not in (INLINE, THREAD, PROCESS):
+            raise ValueError(f"Unknown execution class {execution!r}")
+        self.tools[name or fn.__name__] = (fn, execution)
+        if execution == THREAD and self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="tool")
+        return fn
+
+    def start(self):
+        """Start the process pool workers now, so the first process call does not pay for their startup."""
+        if any(execution == PROCESS for _, execution in self.tools.values()):
+            self._process_pool()
+
+    def _process_pool(self):
+        with self._processes_lock:
+            if self._processes is None:
+                # forkserver/spawn rather than fork: the parent runs threads (HTTP pools, write-behind)
+                # that a forked child would inherit in an undefined state.
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.max_processes, mp_context=multiprocessing.get_context(method)
+                )
+                for _ in range(self.max_processes):
+                    self._processes.submit(os.getpid)
+        return self._processes
+
+    def execution(self, name):
+        return self.tools[name][1]
+
+    def span(self, name):
+        return tracer.span(f"execute_tool {name}", {"gen_ai.tool.name": name, "tool.execution": self.tools[name][1]})
+
+    def submit(self, name, **arguments):
+        """Start a tool call and return a Future of its result."""
+        fn, execution = self.tools[name]
+        if execution == THREAD:
+            # The copied context carries the caller's span and tool call id into the pool thread.
+            return self._threads.submit(copy_context().run, fn, **arguments)
+        if execution == PROCESS:
+            arguments = {key: _share(value) for key, value in arguments.items()}
+            future = self._process_pool().submit(_call_in_worker, fn, arguments)
+            shared = [value for value in arguments.values() if isinstance(value, SharedArray)]
+            if shared:
+                future.add_done_callback(lambda _: [value.release() for value in shared])
+            return future
+
+        future = Future()
+        try:
+            future.set_result(fn(**arguments))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def call(self, name, **arguments):
+        """Run a tool call and return its result."""
+        fn, execution = self.tools[name]
+        with self.span(name):
+            if execution == INLINE:
+                return fn(**arguments)
+            return self.submit(name, **arguments).result()
+
+    async def acall(self, name, **arguments):
+        """Run a tool call without blocking the event loop (inline tools excepted)."""
+        fn, execution = self.tools[name]
+        with self.span(name):
+            if execution == INLINE:
+                return fn(**arguments)
+            return await asyncio.wrap_future(self.submit(name, **arguments))
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown()
+
+    def __getitem__(self, name):
+        if name not in self.tools:
+            raise KeyError(name)
+        return partial(self.call, name)
+
+    def __iter__(self):
+        return iter(self.tools)
+
+    def __len__(self):
+        return len(self.tools)
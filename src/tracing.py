@@ -0,0 +1,360 @@
+import atexit
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+# Fraction of traces recorded; decided once per trace, at its root span. 0 turns tracing off.
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# "console" prints each finished trace as a tree on stderr; anything else is a file path.
+EXPORT = os.getenv("TRACE_EXPORT", "data/traces.jsonl")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "chatgpt-apis")
+
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+# inspect.CO_COROUTINE, without importing inspect (several ms) into every entry point.
+CO_COROUTINE = 0x80
+
+_current = ContextVar("span", default=None)
+
+
+def _attribute_value(value):
+    """An attribute value in OTLP/JSON form."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A recorded span; the fields follow the OpenTelemetry span data model."""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_span_id", "kind", "attributes", "events",
+                 "status", "start", "end", "token")
+
+    def __init__(self, tracer, name, trace_id, parent_span_id, kind, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = {}
+        self.events = []
+        self.status = STATUS_UNSET
+        self.end = None
+        if attributes:
+            self.set_attributes(attributes)
+
+    def is_recording(self):
+        return True
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name, attributes=None):
+        self.events.append((name, time.time_ns(), attributes or {}))
+
+    def record_exception(self, exception):
+        self.status = STATUS_ERROR
+        self.add_event("exception", {"exception.type": type(exception).__name__, "exception.message": str(exception)})
+
+    def begin(self):
+        """Start the span without making it current; see ``use_span``."""
+        self.start = time.time_ns()
+        return self
+
+    def finish(self, exception=None):
+        """End a span started with ``begin``."""
+        self.end = time.time_ns()
+        if exception is not None:
+            self.record_exception(exception)
+        self.tracer._finish(self)
+
+    def __enter__(self):
+        self.begin()
+        self.token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        self.finish(exc)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.events:
+            span["events"] = [
+                {
+                    "name": name,
+                    "timeUnixNano": str(at),
+                    "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()],
+                }
+                for name, at, attributes in self.events
+            ]
+        return span
+
+
+class NonRecordingSpan:
+    """Span of a trace that was not sampled; it only marks the context so children are not recorded either."""
+
+    __slots__ = ("token",)
+
+    def is_recording(self):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def begin(self):
+        return self
+
+    def finish(self, exception=None):
+        pass
+
+    def __enter__(self):
+        self.token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+
+
+class _NoopSpan(NonRecordingSpan):
+    """Shared span returned when tracing is off or the trace is already unsampled; does not touch the context."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class use_span:
+    """Make a span started with ``begin`` the current one within a block, without ending it.
+
+    For a span that stays open across the yields of a generator: entering the
+    span itself would leave it current in the consumer between chunks, so the
+    consumer's own spans would become its children. The block must not yield.
+    """
+
+    __slots__ = ("span", "token")
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+
+
+class FileExporter:
+    """Appends one OTLP/JSON ``{"resourceSpans": ...}`` line per trace, the format of the collector's otlpjsonfile receiver."""
+
+    def __init__(self, path, service_name=SERVICE_NAME):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        atexit.register(self.close)
+
+    def export(self, spans):
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        })
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class ConsoleExporter:
+    """Prints each trace as an indented tree of span durations and attributes."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        children = {}
+        for span in spans:
+            children.setdefault(span.parent_span_id, []).append(span)
+        ids = {span.span_id for span in spans}
+        lines = []
+
+        def render(span, depth):
+            attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+            error = " ERROR" if span.status == STATUS_ERROR else ""
+            lines.append(f"{'  ' * depth}{span.name} {(span.end - span.start) / 1e6:.1f} ms{error} {attributes}".rstrip())
+            for child in sorted(children.get(span.span_id, []), key=lambda child: child.start):
+                render(child, depth + 1)
+
+        for root in sorted((span for span in spans if span.parent_span_id not in ids), key=lambda span: span.start):
+            render(root, 0)
+        with self.lock:
+            print(f"trace {spans[0].trace_id}\n" + "\n".join(lines), file=self.stream)
+
+
+class Tracer:
+    """Nested spans per turn, exported a whole trace at a time.
+
+    ``span(name, attributes)`` is a context manager; a span opened inside
+    another one (in the same thread or task, or a thread started with a
+    copied context) becomes its child. Whether a trace is recorded is
+    decided at its root span with probability ``sample_rate``; when it is
+    not, every span of the trace is a shared no-op, so an unsampled turn
+    costs a context variable lookup per span.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, exporter=None):
+        self.sample_rate = sample_rate
+        self._exporter = exporter
+        self.lock = threading.Lock()
+        # Finished spans of the traces whose root span is still open.
+        self.open_traces = {}
+
+    @property
+    def exporter(self):
+        if self._exporter is None:
+            self._exporter = ConsoleExporter() if EXPORT == "console" else FileExporter(EXPORT)
+        return self._exporter
+
+    def span(self, name, attributes=None, kind=1):
+        """Start a span; ``kind`` is the OTLP SpanKind (1 internal, 3 client)."""
+        parent = _current.get()
+        if parent is None:
+            if self.sample_rate <= 0:
+                return NOOP_SPAN
+            if random.random() >= self.sample_rate:
+                return NonRecordingSpan()
+            trace_id = f"{random.getrandbits(128):032x}"
+            with self.lock:
+                self.open_traces[trace_id] = []
+            return Span(self, name, trace_id, None, kind, attributes)
+        if not isinstance(parent, Span):
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+
+    def traced(self, name):
+        """Decorator running each call of a function (or coroutine function) in a span."""
+        def decorator(fn):
+            if fn.__code__.co_flags & CO_COROUTINE:
+                @functools.wraps(fn)
+                async def wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await fn(*args, **kwargs)
+            else:
+                @functools.wraps(fn)
+                def wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span):
+        with self.lock:
+            if span.parent_span_id is None:
+                spans = self.open_traces.pop(span.trace_id, [])
+                spans.append(span)
+            elif span.trace_id in self.open_traces:
+                self.open_traces[span.trace_id].append(span)
+                return
+            else:
+                # Outlived its root span (e.g. a background task); exported on its own.
+                spans = [span]
+            exporter = self.exporter
+        exporter.export(spans)
+
+
+def completion_span(model, turn_type=None):
+    """Span of one chat completion, named and attributed per the OpenTelemetry GenAI conventions."""
+    return tracer.span(
+        f"chat {model}",
+        {
+            "gen_ai.operation.name": "chat",
+            "gen_ai.system": "openai",
+            "gen_ai.request.model": model,
+            "router.turn_type": turn_type,
+        },
+        kind=3,
+    )
+
+
+def traced_poll(retrieve, on_status, model, run_id, interval=5):
+    """Poll an assistants run until it completes, calling ``on_status`` with every status.
+
+    The run is an "assistant.run" span with a "runs.retrieve" child per poll;
+    the token usage of the completed run and the number of polls are added to it.
+    """
+    attributes = {"gen_ai.system": "openai", "gen_ai.request.model": model, "openai.run.id": run_id}
+    with tracer.span("assistant.run", attributes) as run_span:
+        polls = 0
+        while True:
+            time.sleep(interval)
+            with tracer.span("runs.retrieve", kind=3) as span:
+                run_status = retrieve()
+                span.set_attribute("openai.run.status", run_status.status)
+            polls += 1
+            if run_status.status == "completed":
+                usage = getattr(run_status, "usage", None)
+                if usage is not None:
+                    run_span.set_attributes({
+                        "gen_ai.usage.input_tokens": usage.prompt_tokens,
+                        "gen_ai.usage.output_tokens": usage.completion_tokens,
+                    })
+            on_status(run_status)
+            if run_status.status == "completed":
+                break
+        run_span.set_attribute("openai.run.polls", polls)
+    return run_status
+
+
+def current_span():
+    """The innermost open span, or a no-op span."""
+    return _current.get() or NOOP_SPAN
+
+
+tracer = Tracer()
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WEATHER_API_BASE_URL = os.getenv("WEATHER_API_BASE_URL", "http://api.weatherapi.com/v1")
+WEATHER_API_URL = f"{WEATHER_API_BASE_URL}/current.json"
+
+
+# Current conditions change slowly, so successful lookups are reused for a few minutes.
+# Every location maps to (fetched_at, Future): concurrent lookups of a location, such as
+# a prefetch and the model's tool call, wait for the same request instead of sending two.
+# Entries are kept in the order they were fetched, so expired ones are pruned from the
+# front, and at most WEATHER_CACHE_SIZE locations are kept.
+WEATHER_CACHE_TTL = 600
+WEATHER_CACHE_SIZE = 1024
+_weather_cache = OrderedDict()
+_weather_cache_lock = threading.Lock()
+
+
+def get_current_weather(location: str) -> dict:
+    """Return the current temperature, description and humidity for a location."""
+    key = location.strip().lower()
+    now = time.monotonic()
+    with _weather_cache_lock:
+        while _weather_cache and now - next(iter(_weather_cache.values()))[0] >= WEATHER_CACHE_TTL:
+            _weather_cache.popitem(last=False)
+        entry = _weather_cache.get(key)
+        owner = entry is None
+        if owner:
+            entry = _weather_cache[key] = (now, Future())
+            if len(_weather_cache) > WEATHER_CACHE_SIZE:
+                _weather_cache.popitem(last=False)
+
+    future = entry[1]
+    if owner:
+        try:
+            results = fetch_current_weather(location)
+        except Exception as e:
+            results = e
+        if not results or isinstance(results, Exception):
+            # Failed lookups are not cached, so the next question retries them.
+            with _weather_cache_lock:
+                if _weather_cache.get(key) is entry:
+                    del _weather_cache[key]
+        if isinstance(results, Exception):
+            future.set_exception(results)
+        else:
+            future.set_result(results)
+    return future.result()
+
+
+def fetch_current_weather(location: str) -> dict:
+    """Query the weather API for a location, bypassing the cache."""
+    appid = os.getenv("OPENWEATHER_API_KEY")
+    try:
+        response = requests.get(WEATHER_API_URL, params={"q": location, "key": appid}, timeout=10)
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "location": data["location"]["name"],
+                "temperature": data["current"]["temp_f"],
+                "description": data["current"]["condition"]["text"],
+                "humidity": data["current"]["humidity"],
+            }
+        return {}
+    except requests.exceptions.RequestException as e:
+        print("Error occurred during API request:", e)
+        return {}
@@ -0,0 +1,224 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applied_writes (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    applied_at REAL NOT NULL,
+    status TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Durable write-behind queue for the writes of side-effecting tools.
+
+    ``submit`` appends the intent to a log file and fsyncs it, then returns;
+    the tool answers the user without waiting for the database. A background
+    thread applies the queued intents to SQLite in batched transactions (up to
+    ``batch_size`` intents, or whatever arrived within ``max_delay``), calling
+    ``handlers[kind](conn, payload)`` for each one.
+
+    Every intent has an idempotency key (the tool call id): a key is applied
+    at most once, even when the log is replayed after a crash. The log is
+    truncated whenever everything in it has been committed, and replayed on
+    start. ``close`` (also run at exit) flushes the queue.
+
+    State a process keeps in memory besides the database (e.g. seat counts)
+    is rebuilt on start: ``loaders[kind](conn)`` yields the ``(key, payload)``
+    pairs committed by earlier processes, and ``restore(kind, payload)`` is
+    called once for each of them and for each logged intent not committed
+    yet, before the first ``submit``. Their keys are remembered, so a retried
+    tool call is still recognized as a duplicate after a restart.
+    """
+
+    def __init__(self, path, handlers, schema="", log_path=None, batch_size=256, max_delay=0.05,
+                 fsync=True, remember=100000, loaders=None, restore=None):
+        self.path = path
+        self.handlers = handlers
+        self.schema = schema
+        self.log_path = log_path or path + ".intents"
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.remember = remember
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.recent = OrderedDict()
+        self.stats = {"submitted": 0, "duplicates": 0, "applied": 0, "failed": 0, "batches": 0}
+
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        self._load(loaders or {}, restore)
+        self._replay(restore)
+        self.log = open(self.log_path, "a")
+        self.worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def _load(self, loaders, restore):
+        """Remember (and restore) the writes committed by previous processes."""
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA + self.schema)
+            conn.row_factory = sqlite3.Row
+            for kind, loader in loaders.items():
+                for key, payload in loader(conn):
+                    self._remember(key, payload)
+                    if restore is not None:
+                        restore(kind, payload)
+        finally:
+            conn.close()
+
+    def _replay(self, restore=None):
+        """Queue the intents a previous process logged but may not have committed."""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path) as f:
+            for line in f:
+                try:
+                    intent = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; its tool call never returned.
+                    break
+                # An intent committed just before a crash is also in the log; it was restored by _load.
+                if restore is not None and intent["key"] not in self.recent:
+                    restore(intent["kind"], intent["payload"])
+                self._remember(intent["key"], intent["payload"])
+                self.queue.put(intent)
+                self.pending += 1
+        if self.pending:
+            logger.info(f"Replaying {self.pending} logged writes from {self.log_path}")
+
+    def _remember(self, key, payload):
+        self.recent[key] = payload
+        if len(self.recent) > self.remember:
+            self.recent.popitem(last=False)
+
+    def submit(self, kind, key, make_payload):
+        """Log the write of one tool call and queue it; return its payload.
+
+        ``make_payload()`` performs the in-memory side of the tool call and
+        returns the payload to persist, or None if there is nothing to write.
+        If ``key`` was submitted before, the earlier payload is returned and
+        ``make_payload`` is not called again.
+        """
+        with self.lock:
+            if key in self.recent:
+                self.stats["duplicates"] += 1
+                return self.recent[key]
+            payload = make_payload()
+            if payload is None:
+                return None
+            self.log.write(json.dumps({"key": key, "kind": kind, "payload": payload}) + "\n")
+            self.log.flush()
+            if self.fsync:
+                os.fsync(self.log.fileno())
+            self._remember(key, payload)
+            self.pending += 1
+            self.stats["submitted"] += 1
+        self.queue.put({"key": key, "kind": kind, "payload": payload})
+        return payload
+
+    def _apply(self, conn, intent):
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO applied_writes (key, kind, applied_at, status) VALUES (?, ?, ?, 'applied')",
+            (intent["key"], intent["kind"], time.time()),
+        ).rowcount
+        if inserted:
+            self.handlers[intent["kind"]](conn, intent["payload"])
+        return inserted
+
+    @staticmethod
+    def _transaction(conn, apply):
+        conn.execute("BEGIN")
+        try:
+            result = apply()
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def _commit(self, conn, batch):
+        failed = 0
+        try:
+            applied = self._transaction(conn, lambda: sum(self._apply(conn, intent) for intent in batch))
+        except Exception:
+            # Find the failing intents by applying them one at a time; they are recorded
+            # as failed so a replay does not run into them again.
+            applied = 0
+            for intent in batch:
+                try:
+                    applied += self._transaction(conn, lambda: self._apply(conn, intent))
+                except Exception:
+                    logger.exception(f"Write {intent['key']} ({intent['kind']}) failed")
+                    failed += 1
+                    conn.execute(
+                        "INSERT OR IGNORE INTO applied_writes (key, kind, applied_at, status) VALUES (?, ?, ?, 'failed')",
+                        (intent["key"], intent["kind"], time.time()),
+                    )
+
+        with self.lock:
+            self.stats["applied"] += applied
+            self.stats["failed"] += failed
+            self.stats["batches"] += 1
+            self.pending -= len(batch)
+            if self.pending == 0:
+                # Everything logged so far is committed.
+                self.log.truncate(0)
+                self.log.seek(0)
+        for _ in batch:
+            self.queue.task_done()
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA + self.schema)
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is _STOP:
+                self.queue.task_done()
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                try:
+                    intent = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if intent is _STOP:
+                    self.queue.task_done()
+                    stopping = True
+                    break
+                batch.append(intent)
+            self._commit(conn, batch)
+        conn.close()
+
+    def flush(self):
+        """Block until every submitted write is committed."""
+        self.queue.join()
+
+    def close(self):
+        if self.worker.is_alive():
+            self.queue.put(_STOP)
+            self.worker.join()
+            self.log.close()
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "pending": self.pending}
@@ -0,0 +1,21 @@
+import pytest
+
+from function_calling_stocks import calculate
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [("max(3, 5)", 5.0), ("sum(1, 2, 3)", 6.0), ("sum([1, 2], 3)", 6.0), ("min([4, 9])", 4.0), ("10 * 173.97 - 5", 1734.7),
+     ("2**64", 2.0**64), ("10**20", 1e20), ("-(2**63) * 2", -(2.0**64))],
+)
+def test_expressions(expression, expected):
+    assert calculate(expression=expression) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [{"op": "sum"}, {"op": "mean", "values": []}, {"op": "mul", "a": 2}, {"expression": "max()"}, {"op": "pow"}],
+)
+def test_missing_operands_raise(arguments):
+    with pytest.raises(ValueError):
+        calculate(**arguments)
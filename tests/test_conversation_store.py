@@ -0,0 +1,26 @@
+from src.conversation_store import ConversationStore
+
+
+def test_sequence_numbers_continue_across_stores(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    first, second = ConversationStore(path), ConversationStore(path)
+    seqs = [store.append("alice", {"role": "user", "content": str(i)}) for i, store in enumerate([first, second] * 3)]
+    seqs.append(first.append("bob", {"role": "user", "content": "hi"}))
+    assert seqs == [0, 1, 2, 3, 4, 5, 0]
+    summary, recent = second.load_recent("alice", limit=3)
+    assert summary is None and [m["content"] for m in recent] == ["3", "4", "5"]
+    first.close()
+    second.close()
+
+
+def test_summary_and_older_pages(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.db"))
+    for i in range(10):
+        store.append("alice", {"role": "user", "content": str(i)})
+    store.add_summary("alice", 3, "asked about Paris")
+    store.add_summary("alice", 6, "asked about Paris and Oslo")
+    summary, recent = store.load_recent("alice", limit=3)
+    assert summary == "asked about Paris and Oslo"
+    assert [(seq, m["content"]) for seq, m in store.load_before("alice", 7, limit=2)] == [(5, "5"), (6, "6")]
+    assert store.load_before("alice", 0) == []
+    store.close()
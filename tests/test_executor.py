@@ -0,0 +1,33 @@
+import json
+
+import requests
+
+from src import llm
+from src.executor import Conversation, run_tool_loop, tool_call_id
+
+
+def response(status_code, message=None, headers=None):
+    r = requests.Response()
+    r.status_code = status_code
+    r.headers.update(headers or {})
+    r._content = json.dumps({"id": f"chatcmpl-{status_code}", "choices": [{"message": message}]}).encode()
+    return r
+
+
+def test_transient_errors_are_retried_with_the_same_tool_call_id(monkeypatch):
+    book = {"role": "assistant", "content": None, "function_call": {"name": "book_flight", "arguments": '{"flight": "KL100"}'}}
+    answer = {"role": "assistant", "content": "Booked."}
+    replies = [response(429, headers={"retry-after": "0"}), response(200, book),
+               response(503, headers={"retry-after": "0"}), response(200, answer)]
+
+    def send_completion(body, model, caller="default"):
+        return llm.check_status(replies.pop(0))
+
+    monkeypatch.setattr(llm, "send_completion", send_completion)
+    bookings = []
+    functions = {"book_flight": lambda flight: bookings.append((flight, tool_call_id.get())) or "booked"}
+    conversation = Conversation([{"role": "user", "content": "Book KL100"}], conversation_id="jane")
+
+    assert run_tool_loop(conversation, [], functions, model="gpt-3.5-turbo-0613", hedge=False) == answer
+    assert bookings == [("KL100", "jane-1")]
+    assert not replies
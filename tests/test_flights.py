@@ -0,0 +1,20 @@
+import pytest
+
+from src.flights import FlightSchedule, synthetic_rows
+
+
+def schedule():
+    return FlightSchedule.from_rows(list(synthetic_rows([("AMS", "JFK")], "2026-10-19 00:00", days=2, departures_per_day=2)))
+
+
+def test_rebase_moves_whole_days():
+    flights = schedule()
+    flights.rebase("2030-01-01")
+    assert flights.next_flights("Amsterdam", "New York", "2030-01-01 00:00")[0]["datetime"] == "2030-01-01 06:00"
+    assert not flights.next_flights("AMS", "JFK", "2030-01-03 00:00")
+
+
+@pytest.mark.parametrize("departure", ["tomorrow 10:00", "19-10-2026 06:00", ""])
+def test_invalid_departures_raise_value_error(departure):
+    with pytest.raises(ValueError, match="expected YYYY-MM-DD HH:MM"):
+        schedule().book("AMS", "JFK", departure, "KLM")
@@ -0,0 +1,20 @@
+import asyncio
+
+import httpx
+
+from src import llm
+
+
+def test_async_request_returns_other_4xx_responses_as_is(monkeypatch):
+    requests = []
+
+    def reply(request):
+        requests.append(request)
+        return httpx.Response(400, json={"error": {"message": "Invalid 'messages'"}})
+
+    monkeypatch.setattr(llm, "_async_client", httpx.AsyncClient(transport=httpx.MockTransport(reply)))
+    response = asyncio.run(llm.achat_completion_request([{"role": "user", "content": "Weather?"}], model="gpt-3.5-turbo-0613"))
+
+    assert response.status_code == 400
+    assert response.json()["error"]["message"] == "Invalid 'messages'"
+    assert len(requests) == 1
@@ -0,0 +1,24 @@
+from src.plan import execute_plan
+
+TOOLS = {
+    "price": lambda value: value,
+    "evaluate": lambda expression: eval(expression, {"__builtins__": {}}),
+}
+
+
+def test_difference_of_two_steps():
+    steps = [
+        {"id": "aapl", "tool": "price", "args": {"value": 5.0}},
+        {"id": "msft", "tool": "price", "args": {"value": 3.0}},
+        {"id": "diff", "tool": "evaluate", "args": {"expression": "$aapl-$msft"}},
+    ]
+    assert execute_plan(steps, TOOLS) == {"results": {"aapl": 5.0, "msft": 3.0, "diff": 2.0}, "errors": {}}
+
+
+def test_invalid_plans_are_reported_not_raised():
+    cycle = [{"id": "a", "tool": "price", "args": {"value": "$b"}}, {"id": "b", "tool": "price", "args": {"value": "$a"}}]
+    unknown = [{"id": "a", "tool": "price", "args": {"value": "$missing"}}]
+    for steps in (cycle, unknown, [{"tool": "price"}]):
+        result = execute_plan(steps, TOOLS)
+        assert result["results"] == {}
+        assert "plan" in result["errors"]
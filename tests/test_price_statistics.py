@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import function_calling_stocks
+from function_calling_stocks import get_price_statistics
+
+
+@pytest.fixture(autouse=True)
+def histories(monkeypatch):
+    days = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-03-01"))
+    closes = {"AAPL": 100 + np.arange(len(days), dtype=float), "MSFT": 200 - np.arange(len(days), dtype=float) ** 0.5}
+    requested = []
+
+    def get_history(symbol, start, end):
+        requested.append((symbol, start, end))
+        if symbol == "FAIL":
+            raise ConnectionError("no network")
+        if symbol not in closes:
+            return days[:0], np.array([])
+        keep = (days >= np.datetime64(start)) & (days <= np.datetime64(end))
+        return days[keep], closes[symbol][keep]
+
+    monkeypatch.setattr(function_calling_stocks, "get_history", get_history)
+    return requested
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"symbols": [], "start": "2024-01-01"},
+        {"symbols": "AAPL", "start": "2024-01-01"},
+        {"symbols": ["AAPL", 3], "start": "2024-01-01"},
+        {"symbols": ["AAPL"], "start": "January 1st"},
+        {"symbols": ["AAPL"], "start": "2024-02-01", "end": "2024-01-01"},
+        {"symbols": ["AAPL"], "start": "2024-01-01", "moving_average_windows": [0]},
+    ],
+)
+def test_invalid_arguments_return_an_error(arguments):
+    assert "error" in get_price_statistics(**arguments)
+
+
+def test_slashed_dates_are_normalized(histories):
+    result = get_price_statistics(["aapl"], "2024/01/02", "2024/01/31")
+    assert histories == [("AAPL", "2024-01-02", "2024-01-31")]
+    assert result["symbols"]["AAPL"]["trading_days"] == 30
+
+
+def test_failing_symbols_do_not_fail_the_others():
+    result = get_price_statistics(["AAPL", "MSFT", "NOPE", "FAIL"], "2024-01-01", "2024-02-29")
+    assert "error" in result["symbols"]["NOPE"] and "error" in result["symbols"]["FAIL"]
+    assert result["symbols"]["AAPL"]["trading_days"] == 60
+    assert set(result["correlations"]["matrix"]) == {"AAPL", "MSFT"}
+
+
+def test_large_requests_run_in_the_process_pool(monkeypatch):
+    inline = get_price_statistics(["AAPL", "MSFT"], "2024-01-01", "2024-02-29")
+    monkeypatch.setattr(function_calling_stocks, "PROCESS_STATISTICS_ROWS", 100)
+    try:
+        assert get_price_statistics(["AAPL", "MSFT"], "2024-01-01", "2024-02-29") == inline
+        assert function_calling_stocks.analytics._processes is not None
+    finally:
+        function_calling_stocks.analytics.shutdown()
+        function_calling_stocks.analytics._processes = None
+
+
+def test_a_string_is_not_split_into_letters(histories):
+    assert get_price_statistics("AAPL", "2024-01-01") == {"error": "symbols must be a list of ticker symbols, got 'AAPL'"}
+    assert histories == []
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import function_calling_stocks
+from src.price_store import PriceStore, PriceStoreUpdater
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Business days from Monday 2024-01-01 to Friday 2024-01-12.
+    days = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-13"))
+    days = days[np.is_busday(days)]
+    with PriceStoreUpdater(str(tmp_path)) as updater:
+        updater.append("AAPL", days, close=np.arange(len(days), dtype=float))
+    store = PriceStore(str(tmp_path))
+    monkeypatch.setattr(function_calling_stocks, "price_store", store)
+    return store
+
+
+def test_covers_checks_end(store):
+    assert store.covers("AAPL", "2024-01-02", "2024-01-12")
+    # The weekend after the last stored Friday is covered, the Monday after it is not.
+    assert store.covers("AAPL", "2024-01-02", "2024-01-14")
+    assert not store.covers("AAPL", "2024-01-02", "2024-01-15")
+
+
+def test_store_lookups_accept_slashed_dates(store):
+    assert function_calling_stocks.get_price("AAPL", "2024/01/05") == 4.0
+    dates, closes = function_calling_stocks.get_history("aapl", "2024/01/08", "2024/01/09")
+    assert list(closes) == [5.0, 6.0]
+
+
+def test_stale_store_falls_back_to_downloading(store, monkeypatch):
+    downloads = []
+
+    def download_history(symbol, start, end):
+        downloads.append((symbol, start, end))
+        return np.array([], dtype="datetime64[D]"), np.array([])
+
+    monkeypatch.setattr(function_calling_stocks, "download_history", download_history)
+    monkeypatch.setattr(function_calling_stocks, "history_cache", {})
+    function_calling_stocks.get_history("AAPL", "2024-01-02", "2024/01/16")
+    assert downloads == [("AAPL", "2024-01-02", "2024-01-16")]
@@ -0,0 +1,24 @@
+import asyncio
+
+from src.ratelimit import AdaptiveLimiter
+
+
+def test_cancelled_waiter_does_not_leak_capacity():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1)
+        await limiter.aacquire("a")
+        waiter = asyncio.create_task(limiter.aacquire("b"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not limiter.waiting
+
+        granted_then_cancelled = asyncio.create_task(limiter.aacquire("c"))
+        await asyncio.sleep(0.01)
+        limiter.release(200)
+        granted_then_cancelled.cancel()
+        await asyncio.gather(granted_then_cancelled, return_exceptions=True)
+        assert limiter.in_flight == 0
+        await asyncio.wait_for(limiter.aacquire("d"), 1)
+
+    asyncio.run(scenario())
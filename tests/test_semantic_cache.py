@@ -0,0 +1,58 @@
+import pytest
+
+from src.semantic_cache import SemanticCache, numbers
+
+
+def stocks_cache():
+    # The thresholds of the answer cache in function_calling_stocks.py.
+    return SemanticCache(thresholds={"get_price": 0.75, "calculate": 0.85})
+
+
+def weather_cache():
+    # The threshold of the semantic cache in function_call_get_weather.py.
+    return SemanticCache(thresholds={"get_current_weather": 0.6})
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        ("What was the closing price of AAPL on 2023-10-03?", "What was the opening price of AAPL on 2023-10-03?"),
+        ("What was the closing price of AAPL on 2023-10-03?", "What was the highest price of AAPL on 2023-10-03?"),
+        ("What was the low of MSFT on 2023-11-01?", "What was the high of MSFT on 2023-11-01?"),
+        ("What is 10 AAPL shares plus 5 MSFT shares on 2023-10-03?", "What is 10 AAPL shares minus 5 MSFT shares on 2023-10-03?"),
+    ],
+)
+def test_stock_near_misses_do_not_hit(cached, asked):
+    cache = stocks_cache()
+    key = lambda text: {"AAPL", "MSFT"} & set(text.split()) | numbers(text)
+    cache.store(cached, "cached answer", "get_price", key=key(cached))
+    assert cache.lookup(asked, key=key(asked)) is None
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        ("What's the weather in Paris today?", "What's the weather in Paris tomorrow?"),
+        ("What's the weather in Paris today?", "What's the weather in Paris on 2026-10-20?"),
+        ("What's the weather in Paris this week?", "What's the weather in Paris next week?"),
+        ("What's the temperature in Paris in celsius?", "What's the temperature in Paris in fahrenheit?"),
+    ],
+)
+def test_weather_near_misses_do_not_hit(cached, asked):
+    cache = weather_cache()
+    cache.store(cached, "cached answer", "get_current_weather", key=["Paris", *numbers(cached)])
+    assert cache.lookup(asked, key=["Paris", *numbers(asked)]) is None
+
+
+@pytest.mark.parametrize(
+    "cache, tool, cached, asked, key",
+    [
+        (stocks_cache(), "get_price", "What was the closing price of AAPL on 2023-10-03?",
+         "AAPL closing price on 2023-10-03?", {"AAPL", "2023", "10", "03"}),
+        (weather_cache(), "get_current_weather", "What's the weather like in Glasgow today?",
+         "How is the weather in Glasgow today?", {"Glasgow"}),
+    ],
+)
+def test_paraphrases_still_hit(cache, tool, cached, asked, key):
+    cache.store(cached, "cached answer", tool, key=key)
+    assert cache.lookup(asked, key=key) == "cached answer"
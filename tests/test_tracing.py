@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from src import llm, tracing
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans += spans
+
+
+def stream(request):
+    chunks = [f'data: {{"choices": [{{"delta": {{"content": "{word}"}}}}]}}\n\n' for word in ("Sunny", " and", " warm")]
+    return httpx.Response(200, content="".join(chunks) + "data: [DONE]\n\n", headers={"content-type": "text/event-stream"})
+
+
+def test_stream_span_is_not_current_across_yields(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracing.tracer, "_exporter", exporter)
+    monkeypatch.setattr(llm, "_async_client", httpx.AsyncClient(transport=httpx.MockTransport(stream)))
+
+    async def consume(stop_early):
+        tokens = []
+        with tracing.tracer.span("turn"):
+            stream = llm.astream_chat_completion([{"role": "user", "content": "Weather?"}], model="gpt-3.5-turbo-0613")
+            async for token in stream:
+                assert tracing.current_span().name == "turn"
+                with tracing.tracer.span("render"):
+                    tokens.append(token)
+                if stop_early:
+                    break
+            # Closing the stream from the consumer, as when a client disconnects.
+            await stream.aclose()
+        return tokens
+
+    assert asyncio.run(consume(False)) == ["Sunny", " and", " warm"]
+    assert asyncio.run(consume(True)) == ["Sunny"]
+    spans = {span.span_id: span for span in exporter.spans}
+    for span in exporter.spans:
+        parent = spans.get(span.parent_span_id)
+        if span.name == "render":
+            assert parent.name == "turn"
+        if span.name.startswith("chat "):
+            assert parent.name == "turn" and span.end is not None and span.status != tracing.STATUS_ERROR
+    assert sum(span.name.startswith("chat ") for span in exporter.spans) == 2
+
+
+def test_traced_poll_records_the_run(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracing.tracer, "_exporter", exporter)
+    statuses = iter([
+        SimpleNamespace(status="in_progress"),
+        SimpleNamespace(status="requires_action"),
+        SimpleNamespace(status="completed", usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3)),
+    ])
+    seen = []
+
+    final = tracing.traced_poll(lambda: next(statuses), lambda run: seen.append(run.status), "gpt-4", "run_1", interval=0)
+
+    assert final.status == "completed"
+    assert seen == ["in_progress", "requires_action", "completed"]
+    run = next(span for span in exporter.spans if span.name == "assistant.run")
+    assert run.attributes["openai.run.polls"] == 3
+    assert run.attributes["gen_ai.usage.input_tokens"] == 12
+    polls = [span for span in exporter.spans if span.name == "runs.retrieve"]
+    assert [span.attributes["openai.run.status"] for span in polls] == seen
+    assert all(span.parent_span_id == run.span_id for span in polls)
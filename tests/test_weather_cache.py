@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from src import utils
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fetch_current_weather(location):
+        calls.append(location)
+        time.sleep(0.05)
+        return {} if location == "Nowhere" else {"location": location, "temperature": 60}
+
+    monkeypatch.setattr(utils, "fetch_current_weather", fetch_current_weather)
+    monkeypatch.setattr(utils, "_weather_cache", utils.OrderedDict())
+    return calls
+
+
+def test_concurrent_lookups_fetch_once(fetches):
+    threads = [threading.Thread(target=utils.get_current_weather, args=(location,)) for location in ["Paris", " paris"] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fetches) == 1
+
+
+def test_failed_lookups_are_retried(fetches):
+    assert utils.get_current_weather("Nowhere") == {}
+    assert utils.get_current_weather("Nowhere") == {}
+    assert len(fetches) == 2
+
+
+def test_cache_is_pruned_and_bounded(fetches, monkeypatch):
+    monkeypatch.setattr(utils, "WEATHER_CACHE_SIZE", 2)
+    for location in ("Paris", "Oslo", "Rome"):
+        utils.get_current_weather(location)
+    assert list(utils._weather_cache) == ["oslo", "rome"]
+    monkeypatch.setattr(utils, "WEATHER_CACHE_TTL", 0)
+    utils.get_current_weather("Rome")
+    assert list(utils._weather_cache) == ["rome"] and len(fetches) == 4
@@ -0,0 +1,42 @@
+import json
+
+from src.write_behind import WriteBehindQueue
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS bookings (booking_id TEXT PRIMARY KEY, flight TEXT);"
+
+
+def write_booking(conn, booking):
+    conn.execute("INSERT INTO bookings VALUES (:booking_id, :flight)", booking)
+
+
+def load_bookings(conn):
+    for row in conn.execute("SELECT * FROM bookings"):
+        yield row["booking_id"], dict(row)
+
+
+def queue(path, restored=None):
+    return WriteBehindQueue(
+        str(path), {"booking": write_booking}, schema=SCHEMA, fsync=False,
+        loaders={"booking": load_bookings},
+        restore=lambda kind, payload: restored.append(payload["booking_id"]) if restored is not None else None,
+    )
+
+
+def test_restart_restores_committed_and_logged_writes(tmp_path):
+    path = tmp_path / "writes.db"
+    writes = queue(path)
+    writes.submit("booking", "call-1", lambda: {"booking_id": "call-1", "flight": "KL100"})
+    writes.close()
+    # A process that crashed after logging call-2 (and call-1 again) but before committing them.
+    with open(f"{path}.intents", "w") as log:
+        for key in ("call-1", "call-2"):
+            log.write(json.dumps({"key": key, "kind": "booking", "payload": {"booking_id": key, "flight": "KL100"}}) + "\n")
+
+    restored = []
+    writes = queue(path, restored)
+    assert restored == ["call-1", "call-2"]
+    retried = writes.submit("booking", "call-1", lambda: {"booking_id": "call-1", "flight": "DL101"})
+    assert retried["flight"] == "KL100"
+    assert writes.snapshot()["duplicates"] == 1
+    writes.flush()
+    writes.close()